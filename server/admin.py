@@ -1,9 +1,12 @@
 from flask import Blueprint, jsonify, request
 from flask_restful import Api, Resource, reqparse
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Category, User, Admin
+from flask_jwt_extended import jwt_required, current_user
+from models import db, Category
 from functools import wraps
 from config import cloudinary
+from cache import get_cache, invalidate
+from generations import CATEGORIES, bump_generation
+from categories import get_category_store
 import logging
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/shopit/admin')
@@ -19,12 +22,12 @@ update_category_parser.add_argument('name', type=str, required=False, help='Cate
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity() 
-        admin = Admin.query.get(user_id)  
+        # Role comes from the token's claims, so this costs no query
+        role = current_user.role_for('admin')
 
-        if not admin:
+        if role is None:
             return {"error": "Admin not found"}, 404  
-        if admin.role.name != 'Admin': 
+        if role != 'Admin': 
             return {"error": "Admin access required"}, 403 
 
         return fn(*args, **kwargs)  
@@ -65,7 +68,10 @@ class CreateCategoryResource(Resource):
         # Create the category
         category = Category(name=category_name, image_url=image_url)
         db.session.add(category)
+        bump_generation(CATEGORIES)
         db.session.commit()
+        get_category_store().expire()
+        invalidate('categories')
 
         return {"message": "Category created", "category_id": category.id}, 201
 
@@ -88,7 +94,10 @@ class UpdateCategoryResource(Resource):
                 upload_result = cloudinary.uploader.upload(file)
                 category.image_url = upload_result.get('secure_url')
 
+        bump_generation(CATEGORIES)
         db.session.commit()
+        get_category_store().expire()
+        invalidate('categories', f'category:{category_id}')
         return {"message": "Category updated", "category_id": category.id}, 200
 
     
@@ -112,8 +121,18 @@ class UpdateCategoryResource(Resource):
                 upload_result = cloudinary.uploader.upload(file)
                 category.image_url = upload_result.get('secure_url')
 
+        bump_generation(CATEGORIES)
         db.session.commit()
+        get_category_store().expire()
+        invalidate('categories', f'category:{category_id}')
         return {"message": "Category updated", "category_id": category.id}, 200
 
+class CacheStatsResource(Resource):
+    @jwt_required()
+    @admin_required
+    def get(self):
+        return get_cache().stats(), 200
+
 admin_api.add_resource(CreateCategoryResource, '/create_category')
-admin_api.add_resource(UpdateCategoryResource, '/update_category/<int:category_id>')
\ No newline at end of file
+admin_api.add_resource(UpdateCategoryResource, '/update_category/<int:category_id>')
+admin_api.add_resource(CacheStatsResource, '/cache_stats')
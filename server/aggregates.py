@@ -0,0 +1,179 @@
+#aggregates.py
+from sqlalchemy import case, distinct, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from generations import RATINGS, bump_generation
+from models import (db, Product, Review, Order, OrderItem, ProductRatingStats, SellerRatingStats,
+                    SellerDailySales, ProductDailySales)
+
+RATING_VALUES = range(1, 6)
+
+
+def _increment(model, key_column, key, deltas):
+    """Add `deltas` ({column name: amount}) to the row keyed by `key`, creating it if missing.
+
+    The UPDATE is done in SQL (col = col + n) so concurrent writers cannot lose
+    each other's changes. Runs inside the caller's transaction.
+    """
+    deltas = {name: amount for name, amount in deltas.items() if amount}
+    if not deltas:
+        return
+
+    values = {getattr(model, name): getattr(model, name) + amount for name, amount in deltas.items()}
+    if model.query.filter(key_column == key).update(values, synchronize_session=False):
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(model(**{key_column.key: key}, **deltas))
+    except IntegrityError:
+        # Another transaction created the row first; fall back to the update
+        model.query.filter(key_column == key).update(values, synchronize_session=False)
+
+
+def _rating_deltas(old_rating, new_rating):
+    deltas = {'review_count': 0, 'rating_sum': 0}
+    if old_rating is not None:
+        old_rating = int(old_rating)
+        deltas['review_count'] -= 1
+        deltas['rating_sum'] -= old_rating
+        deltas[f'stars_{old_rating}'] = deltas.get(f'stars_{old_rating}', 0) - 1
+    if new_rating is not None:
+        new_rating = int(new_rating)
+        deltas['review_count'] += 1
+        deltas['rating_sum'] += new_rating
+        deltas[f'stars_{new_rating}'] = deltas.get(f'stars_{new_rating}', 0) + 1
+    return deltas
+
+
+def record_rating_change(product_id, seller_id, old_rating=None, new_rating=None):
+    """Update product and seller rating totals for a created, edited or deleted review.
+
+    Pass old_rating=None for a new review and new_rating=None for a deleted one.
+    The caller commits.
+    """
+    deltas = _rating_deltas(old_rating, new_rating)
+    _increment(ProductRatingStats, ProductRatingStats.product_id, product_id, deltas)
+    _increment(SellerRatingStats, SellerRatingStats.seller_id, seller_id, deltas)
+    # Product listings show ratings
+    bump_generation(RATINGS)
+
+
+def remove_product_ratings(product):
+    """Take a product's totals out of its seller's before the product is deleted."""
+    stats = product.rating_stats
+    if stats is None:
+        return
+    deltas = {name: -getattr(stats, name) for name in ('review_count', 'rating_sum')}
+    deltas.update({f'stars_{star}': -getattr(stats, f'stars_{star}') for star in RATING_VALUES})
+    _increment(SellerRatingStats, SellerRatingStats.seller_id, product.seller_id, deltas)
+
+
+def _rating_columns():
+    return [
+        func.count(Review.id),
+        func.sum(Review.rating),
+        *[func.sum(case((Review.rating == star, 1), else_=0)) for star in RATING_VALUES],
+    ]
+
+
+STAT_COLUMNS = ['review_count', 'rating_sum'] + [f'stars_{star}' for star in RATING_VALUES]
+
+
+def rebuild_rating_stats():
+    """Recompute every rating total from the reviews table."""
+    ProductRatingStats.query.delete()
+    SellerRatingStats.query.delete()
+
+    db.session.execute(insert(ProductRatingStats).from_select(
+        ['product_id'] + STAT_COLUMNS,
+        select(Review.product_id, *_rating_columns()).group_by(Review.product_id)
+    ))
+    db.session.execute(insert(SellerRatingStats).from_select(
+        ['seller_id'] + STAT_COLUMNS,
+        select(Product.seller_id, *_rating_columns()).join(Review, Review.product_id == Product.id)
+        .group_by(Product.seller_id)
+    ))
+    bump_generation(RATINGS)
+    db.session.commit()
+
+
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def _upsert_add(model, key_names, rows):
+    """Add each row's non-key values onto the existing row with the same key, or insert it.
+
+    Uses a single INSERT ... ON CONFLICT DO UPDATE where the backend supports it.
+    """
+    if not rows:
+        return
+    value_names = [name for name in rows[0] if name not in key_names]
+    dialect_insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+
+    if dialect_insert is None:
+        for row in rows:
+            keys = {name: row[name] for name in key_names}
+            values = {getattr(model, name): getattr(model, name) + row[name] for name in value_names}
+            if not model.query.filter_by(**keys).update(values, synchronize_session=False):
+                db.session.add(model(**row))
+        return
+
+    statement = dialect_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_names,
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in value_names}
+    )
+    db.session.execute(statement, rows)
+
+
+def record_sales(day, lines):
+    """Add one order's line items to the daily rollups. The caller commits.
+
+    `lines` is a list of (product_id, seller_id, quantity, price) tuples.
+    """
+    products = {}
+    sellers = {}
+    for product_id, seller_id, quantity, price in lines:
+        product = products.setdefault(product_id, {'product_id': product_id, 'day': day, 'revenue': 0.0, 'quantity': 0})
+        product['revenue'] += price * quantity
+        product['quantity'] += quantity
+        seller = sellers.setdefault(seller_id, {'seller_id': seller_id, 'day': day, 'revenue': 0.0, 'quantity': 0, 'order_count': 1})
+        seller['revenue'] += price * quantity
+        seller['quantity'] += quantity
+
+    _upsert_add(ProductDailySales, ['product_id', 'day'], list(products.values()))
+    _upsert_add(SellerDailySales, ['seller_id', 'day'], list(sellers.values()))
+
+
+def _order_day():
+    # SQLite has no DATE type; date() yields the 'YYYY-MM-DD' text SQLAlchemy stores
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.date(Order.created_at)
+    return db.cast(Order.created_at, db.Date)
+
+
+def rebuild_sales_rollups():
+    """Recompute every daily sales rollup from the order_items table."""
+    ProductDailySales.query.delete()
+    SellerDailySales.query.delete()
+
+    day = _order_day()
+    revenue = func.sum(OrderItem.price * OrderItem.quantity)
+    quantity = func.sum(OrderItem.quantity)
+
+    db.session.execute(insert(ProductDailySales).from_select(
+        ['product_id', 'day', 'revenue', 'quantity'],
+        select(OrderItem.product_id, day, revenue, quantity).join(Order)
+        .group_by(OrderItem.product_id, day)
+    ))
+    db.session.execute(insert(SellerDailySales).from_select(
+        ['seller_id', 'day', 'revenue', 'quantity', 'order_count'],
+        select(Product.seller_id, day, revenue, quantity, func.count(distinct(Order.id)))
+        .select_from(OrderItem).join(Order).join(Product, Product.id == OrderItem.product_id)
+        .group_by(Product.seller_id, day)
+    ))
+    db.session.commit()
@@ -7,6 +7,8 @@ from seller import seller_bp
 from flask_cors import CORS
 from models import db
 from admin import admin_bp
+from commands import register_commands
+from search import include_object
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -19,6 +21,18 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.json.compact = False
 
+# Payment gateway: 'stripe', or 'fake' to load-test checkout offline
+app.config['PAYMENT_GATEWAY'] = 'stripe'
+app.config['PAYMENT_FAKE_LATENCY'] = 0.3  # seconds per fake charge
+app.config['PAYMENT_FAKE_FAILURE_RATE'] = 0.0
+
+# Catalog response cache: 'memory' (per process), 'redis' (shared, needs the redis package) or 'none'
+app.config['CACHE_BACKEND'] = 'memory'
+app.config['CACHE_REDIS_URL'] = 'redis://localhost:6379/0'
+app.config['CACHE_DEFAULT_TTL'] = 60  # seconds
+app.config['CATEGORY_REFRESH_INTERVAL'] = 5  # seconds between category generation checks
+app.config['REVOCATION_CHECK_INTERVAL'] = 5  # seconds before a logout in one worker reaches the others
+
 # Configure CORS to allow requests from your frontend URL
 CORS(app, supports_credentials=True,resources={r"/*": {"origins": "*"}}) # Adjust the origin as needed
 
@@ -32,7 +46,8 @@ app.register_blueprint(admin_bp)
 bcrypt.init_app(app)
 db.init_app(app)
 jwt.init_app(app)
-migrate = Migrate(app=app, db=db)
+migrate = Migrate(app=app, db=db, include_object=include_object)
+register_commands(app)
 
 @app.route('/')
 def hello():
@@ -7,6 +7,8 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_cors import CORS
 from functools import wraps
 from datetime import timedelta
+from identity import Identity, identity_claims
+from revocation import get_revocation_store
 
 JWT_BLACKLIST_ENABLED = True
 JWT_BLACKLIST_TOKEN_CHECKS = ['access', 'refresh']
@@ -16,9 +18,6 @@ bcrypt = Bcrypt()
 jwt = JWTManager()
 auth_api = Api(auth_bp)
 
-# JWT blacklist
-blacklist = set()
-
 # Argument parsers
 role_parser = reqparse.RequestParser()
 register_parser = reqparse.RequestParser()
@@ -42,24 +41,20 @@ admin_login_parser.add_argument('password', type=str, required=True, help='Passw
 
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blacklist(jwt_header, jwt_payload):
-    return jwt_payload['jti'] in blacklist
+    return get_revocation_store().is_revoked(jwt_payload['jti'], jwt_payload.get('exp'))
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
-    identity = jwt_data["sub"]
-    return User.query.filter_by(id=identity).first()
+    # Built from the token's claims; `current_user.user` loads the row if a handler needs it
+    return Identity.from_claims(jwt_data)
 
 def allow(*allowed_roles):
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
-            user = get_jwt_identity()
-            user = User.query.get(user)
-            roles = [user.role.name]
-            for role in allowed_roles:
-                if role in roles:
-                    return fn(*args, **kwargs)
-            return jsonify({"msg": "Access Denied"}), 403
+            if current_user.has_role(*allowed_roles):
+                return fn(*args, **kwargs)
+            return make_response(jsonify({"msg": "Access Denied"}), 403)
         return decorator
     return wrapper
 
@@ -104,8 +99,9 @@ class LoginResource(Resource):
         if not check_password_hash(user.password, args['password']):
             return {"msg": "Password is incorrect!"}, 401
 
-        token = create_access_token(identity=user.id,expires_delta=timedelta(days=7))
-        refresh_token = create_refresh_token(identity=user.id)
+        claims = identity_claims('user', user)
+        token = create_access_token(identity=user.id, expires_delta=timedelta(days=7), additional_claims=claims)
+        refresh_token = create_refresh_token(identity=user.id, additional_claims=claims)
 
         role = {
             "id": user.role.id,
@@ -168,8 +164,9 @@ class AdminLoginResource(Resource):
         if not check_password_hash(admin.password, args['password']):
             return {"msg": "Password is incorrect!"}, 401
 
-        token = create_access_token(identity=admin.id)
-        refresh_token = create_refresh_token(identity=admin.id)
+        claims = identity_claims('admin', admin)
+        token = create_access_token(identity=admin.id, additional_claims=claims)
+        refresh_token = create_refresh_token(identity=admin.id, additional_claims=claims)
 
         return {
             "token": token,
@@ -180,8 +177,8 @@ class LogoutResource(Resource):
     @jwt_required()
     def post(self):
         try:
-            jti = get_jwt()['jti']
-            blacklist.add(jti)
+            token = get_jwt()
+            get_revocation_store().revoke(token['jti'], token.get('exp'))
             return make_response(jsonify({"msg": "Successfully logged out"}), 200)
         except Exception as e:
             return make_response(jsonify({"msg": str(e)}), 422)
@@ -190,9 +187,10 @@ class LogoutResource(Resource):
 class RefreshResource(Resource):
     @jwt_required(refresh=True)
     def post(self):
-        current_user = get_jwt_identity()
+        identity = get_jwt_identity()
+        claims = {name: value for name, value in get_jwt().items() if name in ('kind', 'role')}
         # Generate a new access token
-        new_token = create_access_token(identity=current_user)
+        new_token = create_access_token(identity=identity, additional_claims=claims)
         return jsonify(access_token=new_token)
 
 
@@ -215,8 +213,7 @@ class ChangePassword(Resource):
             return jsonify({"error": "New passwords do not match."}), 400
         
         # Get the current user
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = current_user.user
         if not user:
             return jsonify({"error": "User not found."}), 404
         
@@ -233,11 +230,8 @@ class ChangePassword(Resource):
 class CheckAuthStatus(Resource):
     @jwt_required()
     def get(self):
-        # Get the identity of the current user
-        current_user_id = get_jwt_identity()
-
-        # Fetch the user from the database
-        user = User.query.get(current_user_id)
+        # Fetch the user from the database, once per request
+        user = current_user.user
         if not user:
             return jsonify({
                 'message': 'User not found',
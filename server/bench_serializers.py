@@ -0,0 +1,63 @@
+#bench_serializers.py
+"""Compare product serialization strategies on transient rows.
+
+Run from the server directory: python bench_serializers.py [rows]
+"""
+import sys
+import timeit
+from datetime import datetime
+from models import Product
+from serializers import compile_serializer, iso
+
+FIELDS = ("id", "title", "description", "price", "category_id", "image_url", "seller_id", "stock", "created_at", "updated_at")
+
+
+def make_products(count):
+    now = datetime.now()
+    return [
+        Product(
+            id=i, title=f"Product {i}", description="A product used for benchmarking", price=9.99 + i,
+            category_id=i % 10, image_url=f"https://example.invalid/{i}.jpg", seller_id=i % 50,
+            stock=100, created_at=now, updated_at=now
+        ) for i in range(count)
+    ]
+
+
+def by_hand(product):
+    return {
+        "id": product.id,
+        "title": product.title,
+        "description": product.description,
+        "price": product.price,
+        "category_id": product.category_id,
+        "image_url": product.image_url,
+        "seller_id": product.seller_id,
+        "stock": product.stock,
+        "created_at": iso(product.created_at),
+        "updated_at": iso(product.updated_at),
+    }
+
+
+def baseline_to_dict(product):
+    # SerializerMixin.to_dict() as it was before compiled serializers
+    return {c.name: getattr(product, c.name) for c in product.__table__.columns}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    products = make_products(count)
+    compiled = compile_serializer(Product, FIELDS)
+
+    strategies = [
+        ("hand-written dict", by_hand),
+        ("compiled", compiled),
+        ("to_dict() before", baseline_to_dict),
+        ("to_dict()", lambda product: product.to_dict()),
+    ]
+    for name, serialize in strategies:
+        seconds = min(timeit.repeat(lambda: [serialize(p) for p in products], number=1, repeat=5))
+        print(f"{name:<20} {count / seconds:>12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
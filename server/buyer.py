@@ -1,22 +1,56 @@
 #buyer.py
 from flask import Blueprint, request, session, make_response, jsonify
 from flask_jwt_extended import jwt_required, current_user, get_jwt_identity
-from models import db, User, Product, Cart, CartItem, Review, Category, OrderItem, Order, Wishlist, UserAddress, UserPayment
+from models import db, Product, Cart, CartItem, Review, Category, OrderItem, Order, Wishlist, UserAddress, UserPayment
 from flask_restful import Api, Resource, reqparse
-from datetime import datetime
+from datetime import date, datetime
 from auth import allow
+from idempotency import gateway_key, idempotent, settled
+from aggregates import record_rating_change, record_sales
+from cache import invalidate, product_tags
+from generations import PRODUCTS, bump_generation
 from config import cloudinary
 from marshmallow import Schema, fields, ValidationError
-import stripe
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+import logging
+from payments import PaymentError, get_gateway
+from serializers import compile_serializer
+from pagination import page_args
 
 buyer_bp = Blueprint('buyer_bp', __name__, url_prefix = '/shopit/buyer')
 buyer_api = Api(buyer_bp)
 
-stripe.api_key = 'sk_test_51Pj5cTAEksgxXJsgAlOZSZzkkgwxFX2YJ1vju3R9F2FYKey9Unhj6r7egYdWEDWGSm94oQ9bt3Ko1a0pqKucqQLu00w9li6Psn'
+REVIEW_FIELDS = ("id", "product_id", "user_id", "rating", "comment", "created_at", "updated_at")
+
+PRODUCT_REVIEW_FIELDS = ("id", "user_id", "rating", "comment", "created_at", "updated_at")
+
+WISHLIST_FIELDS = (
+    "id", "product_id",
+    ("product_title", "product.title"),
+    ("product_description", "product.description"),
+    ("product_price", "product.price"),
+    ("product_image_url", "product.image_url"),
+    "created_at", "updated_at"
+)
+
+ADDED_WISHLIST_FIELDS = (
+    "id",
+    ("title", "product.title"),
+    ("description", "product.description"),
+    ("price", "product.price"),
+    ("image_url", "product.image_url"),
+    "created_at", "updated_at"
+)
+
+HISTORY_ORDER_FIELDS = (("order_id", "id"), "total_price", "status", "created_at", "updated_at")
+
+HISTORY_ITEM_FIELDS = ("product_id", ("product_title", "product.title"), "quantity", "price")
 
 class AddToCart(Resource):
     @jwt_required()
     @allow('Buyer')
+    @idempotent('add_to_cart')
     def post(self):
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -30,7 +64,7 @@ class AddToCart(Resource):
         if product.stock < quantity:
             return jsonify({"error": "Insufficient stock"}), 400
 
-        user = User.query.get(user_id)
+        user = current_user.user
         if not user:
             return jsonify({"error": "User not found"}), 404
 
@@ -52,9 +86,17 @@ class AddToCart(Resource):
             db.session.add(cart_item)
 
         cart.total_price += product.price * quantity
+        was_in_stock = product.stock > 0
         product.stock -= quantity
+        category_id = product.category_id
 
+        # Listings only show and filter on whether a product is in stock
+        sold_out = was_in_stock and product.stock <= 0
+        if sold_out:
+            bump_generation(PRODUCTS)
         db.session.commit()
+        if sold_out:
+            invalidate(*product_tags(product_id, category_id))
 
         return make_response(jsonify({"message": "Product added to cart successfully"}), 201)
 
@@ -64,7 +106,7 @@ class DeleteCartItem(Resource):
     @allow('Buyer')
     def delete(self, product_id):
         user_id = get_jwt_identity()  # Get the user ID from the JWT token
-        user = User.query.get(user_id)
+        user = current_user.user
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -92,21 +134,21 @@ class GetCartResource(Resource):
     @allow('Buyer')
     def get(self):
         user_id = get_jwt_identity()  # Get the user ID from the JWT token
-        user = User.query.get(user_id)
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
 
-        cart = Cart.query.filter_by(user_id=user_id).first()
+        # Cart, line items and the product columns we render, in one joined query
+        cart = Cart.query.options(
+            joinedload(Cart.cart_items).joinedload(CartItem.product).load_only(
+                Product.id, Product.title, Product.description, Product.image_url, Product.price
+            )
+        ).filter_by(user_id=user_id).first()
         if not cart:
-            return jsonify({"error": "Cart not found"}), 404
+            return make_response(jsonify({"error": "Cart not found"}), 404)
 
-        cart_items = CartItem.query.filter_by(cart_id=cart.id).all()
         cart_items_list = []
         total_price = 0
 
-        for item in cart_items:
-            product = Product.query.get(item.product_id)
+        for item in cart.cart_items:
+            product = item.product
             if product:
                 item_total = item.quantity * product.price
                 total_price += item_total
@@ -130,57 +172,77 @@ class UpdateCart(Resource):
     @allow('Buyer')
     def put(self):
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
 
         data = request.json
         updated_items = data.get('items', [])
 
         if not updated_items:
-            return jsonify({"error": "No items provided"}), 400
+            return make_response(jsonify({"error": "No items provided"}), 400)
+
+        # Validate the payload before touching the database
+        quantities = {}
+        for item in updated_items:
+            new_quantity = item.get('quantity')
+            if new_quantity is None or new_quantity <= 0:
+                return make_response(jsonify({"error": "Quantity must be greater than zero"}), 400)
+            quantities[item.get('product_id')] = new_quantity
 
         cart = Cart.query.filter_by(user_id=user_id).first()
         if not cart:
-            return jsonify({"error": "Cart not found"}), 404
+            return make_response(jsonify({"error": "Cart not found"}), 404)
 
-        total_price = 0
+        product_ids = list(quantities)
 
-        for item in updated_items:
-            product_id = item.get('product_id')
-            new_quantity = item.get('quantity')
+        # Two bulk lookups, locking the rows we are about to change
+        cart_items = {
+            cart_item.product_id: cart_item
+            for cart_item in CartItem.query.filter(
+                CartItem.cart_id == cart.id, CartItem.product_id.in_(product_ids)
+            ).with_for_update()
+        }
+        products = {
+            product.id: product
+            for product in Product.query.filter(Product.id.in_(product_ids)).with_for_update()
+        }
 
-            if new_quantity <= 0:
-                return jsonify({"error": "Quantity must be greater than zero"}), 400
+        total_price = 0
+        stock_tags = []  # cache tags of products going in or out of stock
 
-            cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
+        for product_id, new_quantity in quantities.items():
+            cart_item = cart_items.get(product_id)
             if not cart_item:
-                return jsonify({"error": f"Product {product_id} not found in cart"}), 404
+                db.session.rollback()
+                return make_response(jsonify({"error": f"Product {product_id} not found in cart"}), 404)
 
-            product = Product.query.get(product_id)
+            product = products.get(product_id)
             if not product:
-                return jsonify({"error": f"Product {product_id} does not exist"}), 404
+                db.session.rollback()
+                return make_response(jsonify({"error": f"Product {product_id} does not exist"}), 404)
 
             # Calculate the difference between new quantity and current quantity
             quantity_diff = new_quantity - cart_item.quantity
 
             if product.stock < quantity_diff:
-                return jsonify({"error": "Insufficient stock"}), 400
+                db.session.rollback()
+                return make_response(jsonify({"error": "Insufficient stock"}), 400)
 
             # Update the stock and cart item quantity
+            was_in_stock = product.stock > 0
             product.stock -= quantity_diff
             cart_item.quantity = new_quantity
+            if (product.stock > 0) != was_in_stock:
+                stock_tags.extend(product_tags(product_id, product.category_id))
 
             # Calculate the total price
             total_price += new_quantity * product.price
 
-        # Commit all changes at once
-        db.session.commit()
-
-        # Update total price of the cart
+        # Update total price of the cart and commit everything at once
         cart.total_price = total_price
+        if stock_tags:
+            # Listings only show and filter on whether a product is in stock
+            bump_generation(PRODUCTS)
         db.session.commit()
+        invalidate(*stock_tags)
 
         return jsonify({
             "message": "Cart updated successfully",
@@ -191,9 +253,10 @@ class UpdateCart(Resource):
 class Checkout(Resource):
     @jwt_required()
     @allow('Buyer')
+    @idempotent('checkout')
     def post(self):
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_user.user
 
         if not user:
             return make_response(jsonify({"error": "User not found"}), 404)
@@ -216,58 +279,80 @@ class Checkout(Resource):
         if not address:
             return make_response(jsonify({"error": "Shipping address not found"}), 404)
 
+        # Snapshot everything we need as plain values before the charge
+        cart_id = cart.id
+        total_price = cart.total_price
+        username = user.username
+        snapshot = db.session.query(
+            CartItem.id, CartItem.product_id, Product.seller_id, CartItem.quantity, CartItem.price
+        ).join(Product).filter(CartItem.cart_id == cart_id).all()
+        item_ids = [item_id for item_id, *_ in snapshot]
+        lines = [tuple(line) for _, *line in snapshot]
+
+        # Stock for these lines was already taken out when they were added to the
+        # cart, so that hold is the reservation and checkout does not touch stock.
+        # Nothing is written before the charge, so no row locks are held while we
+        # wait on the gateway.
+        gateway = get_gateway()
         try:
-            charge = stripe.Charge.create(
-                amount=int(cart.total_price * 100),  # Stripe expects the amount in cents
+            charge = gateway.charge(
+                amount=int(total_price * 100),  # Stripe expects the amount in cents
                 currency='kes',
-                description=f'Order by {user.username}',
-                source=token
+                description=f'Order by {username}',
+                source=token,
+                idempotency_key=gateway_key('checkout')
             )
-        except stripe.error.StripeError as e:
+        except PaymentError as e:
             return make_response(jsonify({"error": str(e)}), 400)
 
-        # Create a new order with the shipping address
-        order = Order(
-            buyer_id=user_id,
-            total_price=cart.total_price,
-            status="Successful",
-            shipping_address_id=shipping_address_id
-        )
-        db.session.add(order)
-        db.session.commit()
-
-        # Create order items and update product stock
-        cart_items = CartItem.query.filter_by(cart_id=cart.id).all()
-        for item in cart_items:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price=item.price
+        # Persist the order, its items, the payment and the emptied cart together
+        try:
+            order = Order(
+                buyer_id=user_id,
+                total_price=total_price,
+                status="Successful",
+                shipping_address_id=shipping_address_id
             )
-            db.session.add(order_item)
-            
-            product = Product.query.get(item.product_id)
-            product.stock -= item.quantity
-
-        # Create UserPayment entry
-        user_payment = UserPayment(
-            user_id=user_id,
-            payment_method=charge.payment_method_details['type'],
-            account_no=charge.payment_method,
-            amount=charge.amount,  # converting back to original currency
-            name=user.username,
-            description=charge.description,
-            status=charge.status,
-            receipt_url=charge.receipt_url
-        )
-        db.session.add(user_payment)
+            db.session.add(order)
+            db.session.flush()
+            order_id = order.id
+
+            db.session.execute(insert(OrderItem), [
+                {"order_id": order_id, "product_id": product_id, "quantity": quantity, "price": price}
+                for product_id, _, quantity, price in lines
+            ])
+            record_sales(date.today(), lines)
+
+            user_payment = UserPayment(
+                user_id=user_id,
+                payment_method=charge.payment_method_type,
+                account_no=charge.payment_method,
+                amount=charge.amount,  # converting back to original currency
+                name=username,
+                description=charge.description,
+                status=charge.status,
+                receipt_url=charge.receipt_url
+            )
+            db.session.add(user_payment)
 
-        # Empty the cart
-        CartItem.query.filter_by(cart_id=cart.id).delete()
-        cart.total_price = 0
+            # Only what was charged: items added while the charge was in flight stay in the cart
+            CartItem.query.filter(CartItem.id.in_(item_ids)).delete(synchronize_session=False)
+            Cart.query.filter_by(id=cart_id).update(
+                {Cart.total_price: Cart.total_price - total_price}, synchronize_session=False
+            )
 
-        db.session.commit()
+            db.session.commit()
+        except Exception:
+            # Compensate: refund the charge; the cart, and so its stock hold, is left as it was
+            logging.exception("Checkout failed after charge %s; rolling back", charge.id)
+            db.session.rollback()
+            try:
+                gateway.refund(charge.id)
+            except PaymentError:
+                logging.exception("Refund of charge %s failed", charge.id)
+            # Stored rather than released: a retry with the same key would get the
+            # refunded charge replayed by the gateway
+            return settled(make_response(jsonify({"error": "Checkout failed, your payment has been refunded"}), 500))
 
         response = {
             "message": "Checkout successful",
@@ -275,13 +360,15 @@ class Checkout(Resource):
             "charge_status": charge.status,
             "total_amount": charge.amount,
             "currency": charge.currency,
-            "order_id": order.id,
+            "order_id": order_id,
             "receipt_url": charge.receipt_url
         }
         return make_response(jsonify(response), 201)
 
 
 
+RATING_VALUES = (1, 2, 3, 4, 5)
+
 class ReviewPostResource(Resource):
     @jwt_required()
     @allow('Buyer')
@@ -293,15 +380,18 @@ class ReviewPostResource(Resource):
         comment = data.get('comment', '')
 
         if not product_id or not rating:
-            return jsonify({"error": "Product ID and rating are required"}), 400
+            return make_response(jsonify({"error": "Product ID and rating are required"}), 400)
+
+        if rating not in RATING_VALUES:
+            return make_response(jsonify({"error": "Rating must be a whole number from 1 to 5"}), 400)
 
         product = Product.query.get(product_id)
         if not product:
-            return jsonify({"error": "Product not found"}), 404
+            return make_response(jsonify({"error": "Product not found"}), 404)
 
-        user = User.query.get(user_id)
+        user = current_user.user
         if not user:
-            return jsonify({"error": "User not found"}), 404
+            return make_response(jsonify({"error": "User not found"}), 404)
 
         # Check if the user has purchased the product
         order_item = OrderItem.query.join(Order).filter(
@@ -310,7 +400,7 @@ class ReviewPostResource(Resource):
         ).first()
 
         if not order_item:
-            return jsonify({"error": "User has not purchased this product"}), 403
+            return make_response(jsonify({"error": "User has not purchased this product"}), 403)
 
         review = Review(
             product_id=product_id,
@@ -320,6 +410,7 @@ class ReviewPostResource(Resource):
         )
 
         db.session.add(review)
+        record_rating_change(product.id, product.seller_id, new_rating=rating)
         db.session.commit()
 
         return make_response(jsonify({"message": "Review created successfully"}), 201)
@@ -341,7 +432,12 @@ class ReviewUpdateResource(Resource):
         if review.user_id != user_id:
             return {"error": "You can only edit your own reviews"}, 403
 
-        if rating:
+        if rating and rating not in RATING_VALUES:
+            return {"error": "Rating must be a whole number from 1 to 5"}, 400
+
+        if rating and rating != review.rating:
+            seller_id = db.session.query(Product.seller_id).filter_by(id=review.product_id).scalar()
+            record_rating_change(review.product_id, seller_id, old_rating=review.rating, new_rating=rating)
             review.rating = rating
         if comment:
             review.comment = comment
@@ -351,15 +447,7 @@ class ReviewUpdateResource(Resource):
 
         return make_response(jsonify({
             "message": "Review updated successfully",
-            "review": {
-                "id": review.id,
-                "product_id": review.product_id,
-                "user_id": review.user_id,
-                "rating": review.rating,
-                "comment": review.comment,
-                "created_at": review.created_at,
-                "updated_at": review.updated_at
-            }
+            "review": compile_serializer(Review, REVIEW_FIELDS)(review)
         }), 200)
 
 class DeleteReview(Resource):
@@ -375,16 +463,10 @@ class DeleteReview(Resource):
         if review.user_id != user_id:
             return jsonify({"error": "You can only delete your own reviews"}), 403
 
-        deleted_review = {
-            "id": review.id,
-            "product_id": review.product_id,
-            "user_id": review.user_id,
-            "rating": review.rating,
-            "comment": review.comment,
-            "created_at": review.created_at,
-            "updated_at": review.updated_at
-        }
+        deleted_review = compile_serializer(Review, REVIEW_FIELDS)(review)
 
+        seller_id = db.session.query(Product.seller_id).filter_by(id=review.product_id).scalar()
+        record_rating_change(review.product_id, seller_id, old_rating=review.rating)
         db.session.delete(review)
         db.session.commit()
 
@@ -396,28 +478,57 @@ class DeleteReview(Resource):
 
 
 
+REVIEW_SORTS = {
+    'recent': (Review.created_at.desc(), Review.id.desc()),
+    'oldest': (Review.created_at.asc(), Review.id.asc()),
+    'rating_high': (Review.rating.desc(), Review.created_at.desc(), Review.id.desc()),
+    'rating_low': (Review.rating.asc(), Review.created_at.desc(), Review.id.desc()),
+}
+
 class ProductReviewsResource(Resource):
     def get(self, product_id):
-        product = Product.query.get(product_id)
-        if not product:
+        try:
+            page, per_page, sort = page_args(request.args, sorts=REVIEW_SORTS, default_sort='recent')
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        if not db.session.query(Product.query.filter_by(id=product_id).exists()).scalar():
             return {"error": "Product not found"}, 404
 
-        reviews = Review.query.filter_by(product_id=product_id).all()
-        reviews_list = [{
-            "id": review.id,
-            "user_id": review.user_id,
-            "user_name": f"{review.user.first_name} {review.user.last_name}",  # Get the full name of the user
-            "rating": review.rating,
-            "comment": review.comment,
-            "created_at": review.created_at,
-            "updated_at": review.updated_at,
-            "verified_purchase": OrderItem.query.join(Order).filter(
-                Order.buyer_id == review.user_id,
-                OrderItem.product_id == product_id
-            ).count() > 0
-        } for review in reviews]
+        paginated_reviews = Review.query.options(joinedload(Review.user)).filter_by(
+            product_id=product_id
+        ).order_by(*REVIEW_SORTS[sort]).paginate(page=page, per_page=per_page, error_out=False)
+        reviews = paginated_reviews.items
+
+        # Which reviewers on this page bought the product, in one grouped query
+        reviewer_ids = {review.user_id for review in reviews}
+        verified_buyers = set()
+        if reviewer_ids:
+            verified_buyers = {
+                buyer_id for (buyer_id,) in db.session.query(Order.buyer_id).join(OrderItem).filter(
+                    OrderItem.product_id == product_id,
+                    Order.buyer_id.in_(reviewer_ids)
+                ).group_by(Order.buyer_id)
+            }
 
-        return make_response(jsonify(reviews_list), 200)
+        serialize = compile_serializer(Review, PRODUCT_REVIEW_FIELDS)
+        reviews_list = []
+        for review in reviews:
+            review_data = serialize(review)
+            review_data["user_name"] = f"{review.user.first_name} {review.user.last_name}"  # Get the full name of the user
+            review_data["verified_purchase"] = review.user_id in verified_buyers
+            reviews_list.append(review_data)
+
+        return make_response(jsonify({
+            "reviews": reviews_list,
+            "meta": {
+                "page": page,
+                "per_page": per_page,
+                "sort": sort,
+                "total_items": paginated_reviews.total,
+                "total_pages": paginated_reviews.pages
+            }
+        }), 200)
 
 
 
@@ -436,7 +547,7 @@ class AddToWishlistResource(Resource):
         if not product:
             return jsonify({"error": "Product not found"}), 404
 
-        user = User.query.get(user_id)
+        user = current_user.user
         if not user:
             return jsonify({"error": "User not found"}), 404
 
@@ -454,15 +565,7 @@ class AddToWishlistResource(Resource):
 
         return make_response(jsonify({
             "message": "Product added to wishlist successfully",
-            "product": {
-                "id": wishlist.id,
-                "title": product.title,
-                "description": product.description,
-                "price": product.price,
-                "image_url": product.image_url,
-                "created_at": wishlist.created_at,
-                "updated_at": wishlist.updated_at
-            }
+            "product": compile_serializer(Wishlist, ADDED_WISHLIST_FIELDS)(wishlist)
         }), 201)
 
 
@@ -472,20 +575,9 @@ class ViewWishlistResource(Resource):
     @allow('Buyer')
     def get(self):
         user_id = get_jwt_identity()
-        wishlists = Wishlist.query.filter_by(user_id=user_id).all()
-        result = []
-        for item in wishlists:
-            product = Product.query.get(item.product_id)
-            result.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "product_title": product.title,
-                "product_description": product.description,
-                "product_price": product.price,
-                "product_image_url": product.image_url,
-                "created_at": item.created_at,
-                "updated_at": item.updated_at
-            })
+        wishlists = Wishlist.query.options(joinedload(Wishlist.product)).filter_by(user_id=user_id).all()
+        serialize = compile_serializer(Wishlist, WISHLIST_FIELDS)
+        result = [serialize(item) for item in wishlists]
 
         return make_response(jsonify(result), 200)
 
@@ -538,7 +630,7 @@ class GetUserProfile(Resource):
         current_user_id = get_jwt_identity()
 
         # Fetch the user and their addresses
-        user = User.query.get(current_user_id)
+        user = current_user.user
         if not user:
             return {'message': 'User not found'}, 404
 
@@ -557,7 +649,7 @@ class UpdateUserProfile(Resource):
         current_user_id = get_jwt_identity()
 
         # Fetch the user
-        user = User.query.get(current_user_id)
+        user = current_user.user
         if not user:
             return {'message': 'User not found'}, 404
 
@@ -694,7 +786,7 @@ class CheckoutHistory(Resource):
         user_id = get_jwt_identity()
         print(f"Authenticated user ID: {user_id}")  # Debug statement
         
-        buyer = User.query.get(user_id)
+        buyer = current_user.user
         if not buyer:
             return {"error": "User not found"}, 404
         
@@ -705,28 +797,15 @@ class CheckoutHistory(Resource):
             return {"error": "Unauthorized"}, 403
 
        
-        orders = Order.query.filter_by(buyer_id=user_id).all()
+        orders = Order.query.options(*Order.eager_load_options(['order_items.product'])).filter_by(buyer_id=user_id).all()
 
-       
+        serialize_order = compile_serializer(Order, HISTORY_ORDER_FIELDS)
+        serialize_item = compile_serializer(OrderItem, HISTORY_ITEM_FIELDS)
         orders_list = []
         for order in orders:
-            order_items = [
-                {
-                    "product_id": item.product_id,
-                    "product_title": item.product.title,
-                    "quantity": item.quantity,
-                    "price": item.price
-                } for item in order.order_items
-            ]
-
-            orders_list.append({
-                "order_id": order.id,
-                "total_price": order.total_price,
-                "status": order.status,
-                "created_at": order.created_at,
-                "updated_at": order.updated_at,
-                "order_items": order_items
-            })
+            order_data = serialize_order(order)
+            order_data["order_items"] = [serialize_item(item) for item in order.order_items]
+            orders_list.append(order_data)
 
         return jsonify({"orders": orders_list})
 
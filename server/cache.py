@@ -0,0 +1,183 @@
+#cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, make_response, request
+
+DEFAULT_TTL = 60  # seconds; also bounds staleness from writes that do not invalidate
+
+
+class MemoryBackend:
+    """Per-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Shared cache on a Redis (or Redis-protocol compatible) server. Needs the redis package."""
+
+    def __init__(self, url, prefix='shopit:cache:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def versions(self, tags):
+        values = self._client.mget([f'{self.prefix}tag:{tag}' for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tags):
+        pipeline = self._client.pipeline()
+        for tag in tags:
+            pipeline.incr(f'{self.prefix}tag:{tag}')
+        pipeline.execute()
+
+
+class ResponseCache:
+    """Caches whole responses under tags; invalidating a tag orphans every entry carrying it.
+
+    Each tag has a version number that is folded into the entry key, so bumping
+    the version makes old entries unreachable and they age out of the backend.
+    """
+
+    def __init__(self, backend, default_ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def key(self, name, tags):
+        versions = self.backend.versions(tags)
+        raw = json.dumps([name, list(zip(tags, versions))])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, *tags):
+        if tags:
+            self.backend.bump(tags)
+            with self._lock:
+                self.invalidations += len(tags)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations
+            }
+
+
+def get_cache():
+    """Return the app's cache, chosen by the CACHE_BACKEND config value."""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        config = current_app.config
+        if config.get('CACHE_BACKEND', 'memory') == 'redis':
+            backend = RedisBackend(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        else:
+            backend = MemoryBackend(max_entries=config.get('CACHE_MAX_ENTRIES', 1024))
+        cache = ResponseCache(backend, default_ttl=config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL))
+        current_app.extensions['response_cache'] = cache
+    return cache
+
+
+def cached(tags, ttl=None):
+    """Serve repeat GETs for the same path and query string from the response cache.
+
+    `tags` is a list of tag names, or a function of the view's keyword
+    arguments returning one, e.g. lambda product_id: [f'product:{product_id}'].
+    Only 200 responses are stored. Under @conditional the key also includes
+    the ETag, so anything that changes the ETag misses the cache. Set
+    CACHE_BACKEND to 'none' to disable.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            if current_app.config.get('CACHE_BACKEND', 'memory') == 'none':
+                return fn(*args, **kwargs)
+
+            cache = get_cache()
+            entry_tags = tags(**kwargs) if callable(tags) else list(tags)
+            query = sorted(request.args.items(multi=True))
+            key = cache.key([request.path, query, g.get('etag')], entry_tags)
+
+            stored = cache.backend.get(key)
+            cache.count(stored is not None)
+            if stored is not None:
+                response = current_app.response_class(stored['body'], status=200, mimetype=stored['mimetype'])
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                cache.backend.set(key, {
+                    'body': response.get_data(as_text=True),
+                    'mimetype': response.mimetype
+                }, ttl or cache.default_ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorator
+    return wrapper
+
+
+def invalidate(*tags):
+    """Drop every cached response carrying any of `tags`. Call after the write commits."""
+    if current_app.config.get('CACHE_BACKEND', 'memory') != 'none':
+        get_cache().invalidate(*tags)
+
+
+def product_tags(product_id, *category_ids):
+    """Tags touched by a write to one product, listed under the given categories."""
+    return ['products', f'product:{product_id}'] + [f'category:{category_id}' for category_id in set(category_ids)]
@@ -0,0 +1,112 @@
+#catalog.py
+from sqlalchemy import case, func
+from models import db, Product, Category, User, ProductRatingStats
+from projection import RATING_AVERAGE, price_filters, stock_filters
+from search import search_filter
+
+# Upper bounds of the price facet buckets; the last bucket is open ended
+PRICE_BUCKET_LIMITS = [25, 50, 100, 250]
+RATING_THRESHOLDS = [4, 3, 2, 1]
+FACET_LIMIT = 50  # most populated sellers listed in the seller facet
+
+
+def _id_list(args, name):
+    """Read repeated or comma separated integer ids, e.g. ?category_id=1,2&category_id=5."""
+    ids = []
+    for value in args.getlist(name):
+        for part in value.split(','):
+            if part.strip():
+                try:
+                    ids.append(int(part))
+                except ValueError:
+                    raise ValueError(f"{name} must be a list of integers")
+    return ids
+
+
+def catalog_filters(args):
+    """Parse the catalog filter arguments into {facet name: [WHERE clauses]}.
+
+    Keyed by facet so each facet can be counted with every filter but its own.
+    """
+    filters = {}
+    category_ids = _id_list(args, 'category_id')
+    if category_ids:
+        filters['category'] = [Product.category_id.in_(category_ids)]
+    seller_ids = _id_list(args, 'seller_id')
+    if seller_ids:
+        filters['seller'] = [Product.seller_id.in_(seller_ids)]
+    price = price_filters(args)
+    if price:
+        filters['price'] = price
+    if args.get('min_rating'):
+        try:
+            filters['rating'] = [RATING_AVERAGE >= float(args['min_rating'])]
+        except ValueError:
+            raise ValueError("min_rating must be a number")
+    stock = stock_filters(args)
+    if stock:
+        filters['stock'] = stock
+    return filters
+
+
+def filtered(query, filters, terms, exclude=None):
+    """Apply every filter group except `exclude`, plus the search terms if any."""
+    for name, clauses in filters.items():
+        if name != exclude:
+            query = query.filter(*clauses)
+    if terms:
+        query = search_filter(query, terms)
+    return query
+
+
+def _facet_query(*columns):
+    # Rating stats are joined unconditionally so the min_rating filter always has its table
+    return db.session.query(*columns).select_from(Product).outerjoin(
+        ProductRatingStats, ProductRatingStats.product_id == Product.id
+    )
+
+
+def _price_bucket():
+    whens = [(Product.price < limit, index) for index, limit in enumerate(PRICE_BUCKET_LIMITS)]
+    return case(*whens, else_=len(PRICE_BUCKET_LIMITS))
+
+
+def catalog_facets(filters, terms):
+    """Count products per category, seller, price bucket, rating band and stock state."""
+    count = func.count(Product.id)
+
+    categories = filtered(
+        _facet_query(Product.category_id, Category.name, count).outerjoin(Category, Category.id == Product.category_id),
+        filters, terms, exclude='category'
+    ).group_by(Product.category_id, Category.name).order_by(count.desc(), Product.category_id)
+
+    sellers = filtered(
+        _facet_query(Product.seller_id, User.username, count).join(User, User.id == Product.seller_id),
+        filters, terms, exclude='seller'
+    ).group_by(Product.seller_id, User.username).order_by(count.desc(), Product.seller_id).limit(FACET_LIMIT)
+
+    bucket = _price_bucket().label('bucket')
+    buckets = dict(filtered(_facet_query(bucket, count), filters, terms, exclude='price').group_by(bucket).all())
+    bounds = [0] + PRICE_BUCKET_LIMITS + [None]
+
+    ratings = filtered(_facet_query(*[
+        func.coalesce(func.sum(case((RATING_AVERAGE >= threshold, 1), else_=0)), 0) for threshold in RATING_THRESHOLDS
+    ]), filters, terms, exclude='rating').one()
+
+    in_stock, total = filtered(
+        _facet_query(func.coalesce(func.sum(case((Product.stock > 0, 1), else_=0)), 0), count),
+        filters, terms, exclude='stock'
+    ).one()
+
+    return {
+        "categories": [
+            {"id": category_id, "name": name or "Unknown", "count": n} for category_id, name, n in categories
+        ],
+        "sellers": [{"id": seller_id, "username": username, "count": n} for seller_id, username, n in sellers],
+        "price": [
+            {"min": bounds[index], "max": bounds[index + 1], "count": buckets.get(index, 0)}
+            for index in range(len(bounds) - 1)
+        ],
+        "rating": [{"min_rating": threshold, "count": n} for threshold, n in zip(RATING_THRESHOLDS, ratings)],
+        "availability": {"in_stock": in_stock, "out_of_stock": total - in_stock},
+    }
@@ -0,0 +1,84 @@
+#categories.py
+import json
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from flask import current_app
+from models import db, Category
+from generations import CATEGORIES, current_generations
+
+REFRESH_INTERVAL = 5  # seconds between generation checks; bounds staleness across workers
+
+CategoryRow = namedtuple('CategoryRow', ['id', 'name', 'image_url'])
+
+
+class CategorySnapshot:
+    """Immutable copy of the categories table as of one generation."""
+
+    def __init__(self, generation, updated_at, rows):
+        self.generation = generation
+        self.updated_at = updated_at
+        self.by_id = MappingProxyType({row.id: row for row in rows})
+        # Serialized once here so listing categories is a byte copy
+        self.listing_json = json.dumps([row._asdict() for row in rows], indent=2)
+
+    def get(self, category_id):
+        return self.by_id.get(category_id)
+
+
+class CategoryStore:
+    """Holds the current snapshot and swaps in a new one when the generation moves."""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, generation, updated_at):
+        rows = [CategoryRow(*row) for row in db.session.query(
+            Category.id, Category.name, Category.image_url
+        ).order_by(Category.id)]
+        return CategorySnapshot(generation, updated_at, rows)
+
+    def snapshot(self, force_check=False):
+        """Return the current snapshot, checking the DB generation if it is due."""
+        snapshot = self._snapshot
+        if snapshot is not None and not force_check and time.monotonic() - self._checked_at < self.refresh_interval:
+            return snapshot
+
+        with self._lock:
+            # The generation is read first, so a write racing the load only makes the next check reload
+            generation, updated_at = current_generations(CATEGORIES)[CATEGORIES]
+            if self._snapshot is None or self._snapshot.generation != generation:
+                self._snapshot = self._load(generation, updated_at)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def get(self, category_id):
+        """Look up one category, rechecking the generation once before reporting it missing."""
+        row = self.snapshot().get(category_id)
+        if row is None:
+            row = self.snapshot(force_check=True).get(category_id)
+        return row
+
+    def expire(self):
+        """Make the next read recheck the generation, e.g. right after this worker's own write."""
+        self._checked_at = 0.0
+
+
+def get_category_store():
+    store = current_app.extensions.get('category_store')
+    if store is None:
+        store = CategoryStore(current_app.config.get('CATEGORY_REFRESH_INTERVAL', REFRESH_INTERVAL))
+        current_app.extensions['category_store'] = store
+    return store
+
+
+def find_category(category_id):
+    """Return the CategoryRow for an id given as int or string, or None."""
+    try:
+        return get_category_store().get(int(category_id))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,43 @@
+#commands.py
+import sys
+import click
+from models import unindexed_foreign_keys
+from aggregates import rebuild_rating_stats, rebuild_sales_rollups
+from search import rebuild_search_index
+from revocation import get_revocation_store
+
+
+def register_commands(app):
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        """Fail if any foreign key column is missing a supporting index."""
+        missing = unindexed_foreign_keys()
+        if missing:
+            for name in missing:
+                click.echo(f"Missing index for foreign key {name}", err=True)
+            sys.exit(1)
+        click.echo("All foreign keys are indexed.")
+
+    @app.cli.command('rebuild-rating-stats')
+    def rebuild_rating_stats_command():
+        """Recompute product and seller rating totals from the reviews table."""
+        rebuild_rating_stats()
+        click.echo("Rating totals rebuilt.")
+
+    @app.cli.command('backfill-sales-rollups')
+    def backfill_sales_rollups():
+        """Rebuild the daily seller and product sales rollups from order history."""
+        rebuild_sales_rollups()
+        click.echo("Sales rollups rebuilt.")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Repopulate the product search index from the products table."""
+        rebuild_search_index()
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command('purge-revoked-tokens')
+    def purge_revoked_tokens():
+        """Delete revoked-token rows whose tokens have expired."""
+        deleted = get_revocation_store().purge()
+        click.echo(f"Purged {deleted} expired revoked tokens.")
@@ -0,0 +1,89 @@
+#conditional.py
+import hashlib
+import json
+from datetime import timezone
+from functools import wraps
+from flask import current_app, g, make_response, request
+from models import db, Product, ProductRatingStats
+from generations import current_generations
+from categories import get_category_store
+
+
+def _http_time(value):
+    # Timestamps are stored as naive local time; HTTP dates are UTC to the second
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(validators):
+    """Answer If-None-Match / If-Modified-Since with 304 before the view runs.
+
+    `validators(**view kwargs)` returns (version, last_modified) for the
+    resource, where version is any JSON-serializable value that changes with
+    the content, or None when the resource does not exist. The ETag also covers
+    the path and query string, since each gives a different body.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            found = validators(**kwargs)
+            if found is None:
+                return fn(*args, **kwargs)
+
+            version, last_modified = found
+            last_modified = _http_time(last_modified) if last_modified is not None else None
+            raw = json.dumps([request.path, sorted(request.args.items(multi=True)), version], default=str)
+            etag = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+            # cached() folds this into its key, so a cached body never outlives its ETag
+            g.etag = etag
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let clients keep a copy, but make them revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+        return decorator
+    return wrapper
+
+
+def product_validators(product_id):
+    row = db.session.query(
+        Product.updated_at, ProductRatingStats.review_count, ProductRatingStats.rating_sum,
+        *[getattr(ProductRatingStats, f'stars_{star}') for star in range(1, 6)]
+    ).outerjoin(ProductRatingStats, ProductRatingStats.product_id == Product.id).filter(
+        Product.id == product_id
+    ).first()
+    if row is None:
+        return None
+    return list(row), row.updated_at
+
+
+def generation_validators(*names):
+    """Validators for a listing that changes whenever any of the named catalog parts does."""
+    def validators(**kwargs):
+        generations = current_generations(*names)
+        version = [value for value, _ in generations.values()]
+        stamps = [updated_at for _, updated_at in generations.values() if updated_at is not None]
+        return version, max(stamps) if stamps else None
+    return validators
+
+
+def category_validators(**kwargs):
+    # Served from the in-memory snapshot, so revalidating costs no query
+    snapshot = get_category_store().snapshot()
+    return snapshot.generation, snapshot.updated_at
@@ -1,9 +1,19 @@
 
-from flask import Blueprint, jsonify, request, make_response
+from flask import Blueprint, current_app, jsonify, request, make_response
 from flask_restful import Api, Resource
-from models import Product, Category, Role, Order, OrderItem
+from models import Product, Role, Order, OrderItem
+from sqlalchemy.orm import joinedload
 from werkzeug.exceptions import NotFound
 from config import cloudinary
+from pagination import cursor_meta, keyset_page, page_args
+from serializers import compile_serializer
+from cache import cached
+from conditional import category_validators, conditional, generation_validators, product_validators
+from categories import find_category, get_category_store
+from generations import CATEGORIES, PRODUCTS, RATINGS
+from search import apply_search, search_terms
+from catalog import catalog_facets, catalog_filters, filtered
+from projection import LISTING_FIELD_NAMES, RATING_AVERAGE, parse_fields, product_filters, product_rows_query, serialize_product_rows
 
 
 # Create a Blueprint
@@ -16,28 +26,54 @@ class RolesResource(Resource):
         roles = [role.to_dict() for role in Role.query.all()]
         return roles
 
+PRODUCT_FIELDS = ("id", "title", "description", "price", "category_id", "image_url", "seller_id")
+
+LIST_PRODUCT_FIELDS = list(PRODUCT_FIELDS) + ["rating"]
+
+ORDER_FIELDS = (("order_id", "id"), "buyer_id", "total_price", "status", "created_at", "updated_at")
+
+# Sort keys for cursor pagination; the trailing id keeps the ordering total.
+PRODUCT_CURSOR_SORTS = {
+    'id': [('id', Product.id, False)],
+    'newest': [('created_at', Product.created_at, True), ('id', Product.id, True)],
+    'price': [('price', Product.price, False), ('id', Product.id, False)],
+    'price_desc': [('price', Product.price, True), ('id', Product.id, True)],
+    'rating': [('rating_average', RATING_AVERAGE, True), ('id', Product.id, True)],
+}
+
+def wants_total(args):
+    return args.get('with_total', 'false').lower() in ('1', 'true', 'yes')
+
+def rating_summary(stats, histogram=False):
+    if stats is None:
+        data = {"average": None, "count": 0}
+        if histogram:
+            data["histogram"] = {str(star): 0 for star in range(1, 6)}
+        return data
+    return stats.summary(histogram)
+
 class ListProducts(Resource):
+    @conditional(generation_validators(PRODUCTS, CATEGORIES, RATINGS))
+    @cached(['products', 'categories'])
     def get(self):
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        # Cursor mode: pass `after` (or pagination=cursor for the first page)
+        cursor_mode = 'after' in request.args or request.args.get('pagination') == 'cursor'
+        try:
+            pages = page_args(request.args, default_per_page=10,
+                              sorts=PRODUCT_CURSOR_SORTS if cursor_mode else None, default_sort='id')
+            fields = parse_fields(request.args, LISTING_FIELD_NAMES, LIST_PRODUCT_FIELDS)
+        except ValueError as e:
+            return {"error": str(e)}, 400
 
-        paginated_products = Product.query.paginate(page=page, per_page=per_page, error_out=False)
-        products = paginated_products.items
+        if cursor_mode:
+            return self.get_by_cursor(pages, fields)
+
+        page, per_page = pages.page, pages.per_page
+        paginated_products = product_rows_query(fields).order_by(Product.id).paginate(page=page, per_page=per_page, error_out=False)
         total_items = paginated_products.total
         total_pages = paginated_products.pages
 
-        products_list = [
-            {
-                "id": product.id,
-                "title": product.title,
-                "description": product.description,
-                "price": product.price,
-                "category_id": product.category_id,
-                "image_url": product.image_url,
-                "seller_id": product.seller_id
-            } 
-            for product in products
-        ]
+        products_list = serialize_product_rows(paginated_products.items, fields)
 
         return jsonify({
             'products': products_list,
@@ -49,54 +85,133 @@ class ListProducts(Resource):
             }
         })
 
+    def get_by_cursor(self, pages, fields):
+        keys = PRODUCT_CURSOR_SORTS[pages.sort]
+        try:
+            query = product_rows_query(fields, extra=[name for name, _, _ in keys])
+            rows, next_cursor = keyset_page(query, keys, request.args.get('after'), pages.per_page)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        meta = cursor_meta(next_cursor, per_page=pages.per_page, sort=pages.sort)
+        # The total costs a full COUNT(*), so it is opt-in in cursor mode
+        if wants_total(request.args):
+            meta['total_items'] = Product.query.count()
+
+        return jsonify({
+            'products': serialize_product_rows(rows, fields),
+            'meta': meta
+        })
+
+    @staticmethod
+    def serialize(product, histogram=False):
+        product_data = compile_serializer(Product, PRODUCT_FIELDS)(product)
+        product_data["rating"] = rating_summary(product.rating_stats, histogram)
+        return product_data
+
+class SearchProducts(Resource):
+    @conditional(generation_validators(PRODUCTS, CATEGORIES, RATINGS))
+    @cached(['products', 'categories'])
+    def get(self):
+        terms = search_terms(request.args.get('q', ''))
+        if not terms:
+            return {"error": "Search query 'q' is required"}, 400
+        try:
+            page, per_page, _ = page_args(request.args)
+            fields = parse_fields(request.args, LISTING_FIELD_NAMES, LIST_PRODUCT_FIELDS)
+            filters = product_filters(request.args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        category_id = request.args.get('category_id', type=int)
+        if category_id is not None:
+            filters.append(Product.category_id == category_id)
+
+        query = apply_search(product_rows_query(fields).filter(*filters), terms)
+        # One extra row tells us whether there is a next page without a COUNT
+        rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+
+        return make_response(jsonify({
+            'products': serialize_product_rows(rows[:per_page], fields),
+            'meta': {
+                'query': ' '.join(terms),
+                'page': page,
+                'per_page': per_page,
+                'has_more': len(rows) > per_page
+            }
+        }), 200)
+
+class CatalogResource(Resource):
+    """One page of products plus the facet counts for a storefront filter sidebar."""
+    @conditional(generation_validators(PRODUCTS, CATEGORIES, RATINGS))
+    @cached(['products', 'categories'])
+    def get(self):
+        terms = search_terms(request.args.get('q', ''))
+        try:
+            _, per_page, sort = page_args(request.args, sorts=PRODUCT_CURSOR_SORTS, default_sort='newest')
+            keys = PRODUCT_CURSOR_SORTS[sort]
+            fields = parse_fields(request.args, LISTING_FIELD_NAMES, LIST_PRODUCT_FIELDS)
+            filters = catalog_filters(request.args)
+            extra = [name for name, _, _ in keys] + (['rating_average'] if 'rating' in filters else [])
+            query = filtered(product_rows_query(fields, extra=extra), filters, terms)
+            rows, next_cursor = keyset_page(query, keys, request.args.get('after'), per_page)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return make_response(jsonify({
+            'products': serialize_product_rows(rows, fields),
+            'facets': catalog_facets(filters, terms),
+            'meta': cursor_meta(next_cursor, per_page=per_page, sort=sort)
+        }), 200)
+
 class GetProduct(Resource):
+    @conditional(product_validators)
+    @cached(lambda product_id: [f'product:{product_id}'])
     def get(self, product_id):
-        product = Product.query.get(product_id)
+        product = Product.query.options(joinedload(Product.rating_stats)).get(product_id)
         if product is None:
             raise NotFound("Product not found")
-        product_data = {
-            "id": product.id,
-            "title": product.title,
-            "description": product.description,
-            "price": product.price,
-            "category_id": product.category_id,
-            "image_url": product.image_url,
-            "seller_id": product.seller_id
-        }
+        product_data = ListProducts.serialize(product, histogram=True)
         return product_data, 200
 
 class ListCategories(Resource):
+    @conditional(category_validators)
     def get(self):
-        categories = Category.query.all()
-        categories_list = [category.to_dict() for category in categories]
-        return categories_list
+        snapshot = get_category_store().snapshot()
+        return current_app.response_class(snapshot.listing_json, mimetype='application/json')
 
 class ProductsByCategory(Resource):
+    @conditional(generation_validators(PRODUCTS, CATEGORIES, RATINGS))
+    @cached(lambda category_id: [f'category:{category_id}'])
     def get(self, category_id):
-        category = Category.query.get(category_id)
-        if category is None:
+        if find_category(category_id) is None:
             raise NotFound("Category not found")
 
-        products = Product.query.filter_by(category_id=category_id).all()
-        products_list = [
-            {
-                "id": product.id,
-                "title": product.title,
-                "description": product.description,
-                "price": product.price,
-                "category_id": product.category_id,
-                "image_url": product.image_url,
-                "seller_id": product.seller_id
-            }
-            for product in products
-        ]
-        return products_list, 200
+        try:
+            _, per_page, sort = page_args(request.args, sorts=PRODUCT_CURSOR_SORTS, default_sort='newest')
+            keys = PRODUCT_CURSOR_SORTS[sort]
+            fields = parse_fields(request.args, LISTING_FIELD_NAMES, LIST_PRODUCT_FIELDS)
+            filters = [Product.category_id == category_id] + product_filters(request.args)
+            query = product_rows_query(fields, extra=[name for name, _, _ in keys]).filter(*filters)
+            rows, next_cursor = keyset_page(query, keys, request.args.get('after'), per_page)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        meta = cursor_meta(next_cursor, per_page=per_page, sort=sort)
+        if wants_total(request.args):
+            meta['total_items'] = Product.query.filter(*filters).count()
+
+        return make_response(jsonify({
+            'products': serialize_product_rows(rows, fields),
+            'meta': meta
+        }), 200)
 
 class OrderResource(Resource):
     def get(self, order_id):
         try:
             # Fetch the order with its related order items and shipping address
-            order = Order.query.filter_by(id=order_id).first_or_404()
+            order = Order.query.options(
+                *Order.eager_load_options(['order_items.product', 'shipping_address'])
+            ).filter_by(id=order_id).first_or_404()
             
             # Construct response with order items and shipping address
             order_items = [
@@ -120,16 +235,9 @@ class OrderResource(Resource):
                     'country': order.shipping_address.country
                 }
             
-            response = {
-                'order_id': order.id,
-                'buyer_id': order.buyer_id,
-                'total_price': order.total_price,
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-                'updated_at': order.updated_at.isoformat(),
-                'shipping_address': shipping_address,
-                'order_items': order_items
-            }
+            response = compile_serializer(Order, ORDER_FIELDS)(order)
+            response['shipping_address'] = shipping_address
+            response['order_items'] = order_items
             
             return make_response(jsonify(response), 200)
         
@@ -146,6 +254,8 @@ general_api.add_resource(TestResource, '/test')
 # Add resources to the API
 general_api.add_resource(RolesResource, '/roles')
 general_api.add_resource(ListProducts, '/products')
+general_api.add_resource(SearchProducts, '/products/search')
+general_api.add_resource(CatalogResource, '/catalog')
 general_api.add_resource(GetProduct, '/products/<int:product_id>')
 general_api.add_resource(ListCategories, '/categories')
 general_api.add_resource(ProductsByCategory, '/categories/<int:category_id>/products')
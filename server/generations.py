@@ -0,0 +1,33 @@
+#generations.py
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from models import db, CatalogGeneration
+
+PRODUCTS = 'products'
+CATEGORIES = 'categories'
+# Kept apart from PRODUCTS so review writes do not queue on the products row
+RATINGS = 'ratings'
+
+
+def bump_generation(*names):
+    """Record a write to these parts of the catalog. Runs in the caller's transaction."""
+    now = datetime.now()
+    for name in names:
+        values = {CatalogGeneration.value: CatalogGeneration.value + 1, CatalogGeneration.updated_at: now}
+        if CatalogGeneration.query.filter_by(name=name).update(values, synchronize_session=False):
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(CatalogGeneration(name=name, value=1, updated_at=now))
+        except IntegrityError:
+            # Another transaction created the row first
+            CatalogGeneration.query.filter_by(name=name).update(values, synchronize_session=False)
+
+
+def current_generations(*names):
+    """Return {name: (value, updated_at)}; parts never written report (0, None)."""
+    rows = db.session.query(CatalogGeneration.name, CatalogGeneration.value, CatalogGeneration.updated_at).filter(
+        CatalogGeneration.name.in_(names)
+    ).all()
+    found = {name: (value, updated_at) for name, value, updated_at in rows}
+    return {name: found.get(name, (0, None)) for name in names}
@@ -0,0 +1,216 @@
+#idempotency.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, g, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+DEFAULT_TTL = 24 * 60 * 60  # seconds a stored response can be replayed
+IN_FLIGHT_TIMEOUT = timedelta(seconds=60)  # after this a stuck first attempt may be retried
+
+
+class IdempotencyConflict(Exception):
+    """Another request with the same key is still being processed."""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used with a different request body."""
+
+
+class MemoryIdempotencyStore:
+    """Per-process store, for development and single-worker deployments."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, scope, request_hash, ttl):
+        """Reserve `scope`, or return the (status, body) stored for it."""
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry and entry['expires_at'] <= now:
+                del self._entries[scope]
+                entry = None
+
+            if entry:
+                if entry['request_hash'] != request_hash:
+                    raise IdempotencyKeyReused("Idempotency key was already used with a different request")
+                if entry['status_code'] is not None:
+                    self._entries.move_to_end(scope)
+                    return entry['status_code'], entry['response_body']
+                if now - entry['created_at'] < IN_FLIGHT_TIMEOUT:
+                    raise IdempotencyConflict("A request with this idempotency key is already in progress")
+
+            self._entries[scope] = {
+                'request_hash': request_hash,
+                'status_code': None,
+                'response_body': None,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=ttl)
+            }
+            self._entries.move_to_end(scope)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return None
+
+    def complete(self, scope, status_code, response_body):
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry:
+                entry['status_code'] = status_code
+                entry['response_body'] = response_body
+
+    def release(self, scope):
+        with self._lock:
+            self._entries.pop(scope, None)
+
+
+class DatabaseIdempotencyStore:
+    """Store shared by every worker, backed by the idempotency_keys table."""
+
+    def begin(self, scope, request_hash, ttl):
+        """Reserve `scope`, or return the (status, body) stored for it."""
+        user_id, endpoint, key = scope
+        now = datetime.now()
+
+        IdempotencyKey.query.filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+
+        record = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).first()
+        if record:
+            if record.request_hash != request_hash:
+                db.session.commit()
+                raise IdempotencyKeyReused("Idempotency key was already used with a different request")
+            if record.status_code is not None:
+                result = (record.status_code, record.response_body)
+                db.session.commit()
+                return result
+            if now - record.created_at < IN_FLIGHT_TIMEOUT:
+                db.session.commit()
+                raise IdempotencyConflict("A request with this idempotency key is already in progress")
+            db.session.delete(record)
+            db.session.flush()
+
+        db.session.add(IdempotencyKey(
+            user_id=user_id,
+            endpoint=endpoint,
+            key=key,
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise IdempotencyConflict("A request with this idempotency key is already in progress")
+        return None
+
+    def complete(self, scope, status_code, response_body):
+        user_id, endpoint, key = scope
+        IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).update(
+            {'status_code': status_code, 'response_body': response_body}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def release(self, scope):
+        db.session.rollback()
+        user_id, endpoint, key = scope
+        IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).delete(synchronize_session=False)
+        db.session.commit()
+
+
+STORES = {
+    'database': DatabaseIdempotencyStore,
+    'memory': MemoryIdempotencyStore,
+}
+
+
+def get_store():
+    """Return the app's store, chosen by the IDEMPOTENCY_BACKEND config value."""
+    store = current_app.extensions.get('idempotency')
+    if store is None:
+        backend = current_app.config.get('IDEMPOTENCY_BACKEND', 'database')
+        store = current_app.extensions['idempotency'] = STORES[backend]()
+    return store
+
+
+def settled(response):
+    """Mark a 5xx response as final, so @idempotent stores it instead of allowing a retry.
+
+    For handlers that have already undone work a retry would repeat, e.g. by
+    refunding a charge the gateway would otherwise replay for the same key.
+    """
+    g.idempotency_settled = True
+    return response
+
+
+def gateway_key(endpoint):
+    """The request's Idempotency-Key, scoped for passing on to a payment gateway.
+
+    Client keys are only unique per user, while gateway keys are shared by the
+    whole account, so the user and endpoint are hashed in. None without a key.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return None
+    raw = json.dumps([get_jwt_identity(), endpoint, key])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def idempotent(endpoint):
+    """Replay the first response for a repeated Idempotency-Key header.
+
+    Must be applied inside @jwt_required(), since keys are scoped per user.
+    Requests without the header run as usual. 5xx responses are not stored,
+    so a retry after a server error runs the handler again, unless the
+    handler passed the response through settled().
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > 255:
+                return make_response(jsonify({"error": "Idempotency key is too long"}), 400)
+
+            store = get_store()
+            scope = (get_jwt_identity(), endpoint, key)
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+            ttl = current_app.config.get('IDEMPOTENCY_TTL', DEFAULT_TTL)
+
+            try:
+                stored = store.begin(scope, request_hash, ttl)
+            except IdempotencyConflict as e:
+                return make_response(jsonify({"error": str(e)}), 409)
+            except IdempotencyKeyReused as e:
+                return make_response(jsonify({"error": str(e)}), 422)
+
+            if stored is not None:
+                status_code, body = stored
+                response = current_app.response_class(body, status=status_code, mimetype='application/json')
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            g.pop('idempotency_settled', None)
+            try:
+                response = make_response(fn(*args, **kwargs))
+            except Exception:
+                store.release(scope)
+                raise
+
+            if response.status_code >= 500 and not g.get('idempotency_settled'):
+                store.release(scope)
+            else:
+                store.complete(scope, response.status_code, response.get_data(as_text=True))
+            return response
+        return decorator
+    return wrapper
@@ -0,0 +1,81 @@
+#identity.py
+import threading
+import time
+from collections import OrderedDict
+from models import db, User, Admin, Role
+
+ROLE_CACHE_TTL = 60  # seconds a role looked up for a token without claims is trusted
+ROLE_CACHE_SIZE = 10000
+
+ACCOUNT_MODELS = {'user': User, 'admin': Admin}
+
+
+class RoleCache:
+    """Process-wide (kind, id) -> role name map for tokens issued before role claims."""
+
+    def __init__(self, ttl=ROLE_CACHE_TTL, max_entries=ROLE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, account_id):
+        key = (kind, account_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        model = ACCOUNT_MODELS[kind]
+        role = db.session.query(Role.name).join(model, model.role_id == Role.id).filter(model.id == account_id).scalar()
+        with self._lock:
+            self._entries[key] = (role, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return role
+
+
+role_cache = RoleCache()
+
+
+class Identity:
+    """The caller behind a JWT, built from its claims without touching the database.
+
+    `kind` is 'user' or 'admin' and `role` the role name, both set at login.
+    Tokens issued before those claims existed resolve their role through
+    role_cache instead. The account row itself is loaded on first use of
+    `.user` and kept for the rest of the request.
+    """
+
+    def __init__(self, id, kind=None, role=None):
+        self.id = id
+        self.kind = kind
+        self.role = role
+        self._account = None
+
+    @classmethod
+    def from_claims(cls, jwt_data):
+        return cls(jwt_data['sub'], jwt_data.get('kind'), jwt_data.get('role'))
+
+    def role_for(self, kind):
+        """This caller's role name as an account of `kind`, or None if it is not one."""
+        if self.kind is not None:
+            return self.role if self.kind == kind else None
+        return role_cache.get(kind, self.id)
+
+    def has_role(self, *roles, kind='user'):
+        return self.role_for(kind) in roles
+
+    @property
+    def user(self):
+        """The User (or Admin, for admin tokens) row, or None if it no longer exists."""
+        if self._account is None:
+            self._account = db.session.get(ACCOUNT_MODELS[self.kind or 'user'], self.id)
+        return self._account
+
+
+def identity_claims(kind, account):
+    return {'kind': kind, 'role': account.role.name}
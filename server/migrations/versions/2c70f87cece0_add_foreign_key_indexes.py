@@ -0,0 +1,55 @@
+"""Add foreign key indexes
+
+Revision ID: 2c70f87cece0
+Revises: a3f507143e69
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c70f87cece0'
+down_revision = 'a3f507143e69'
+branch_labels = None
+depends_on = None
+
+
+# (table, index name, columns, unique)
+INDEXES = [
+    ('users', 'ix_users_role_id', ['role_id'], False),
+    ('admins', 'ix_admins_role_id', ['role_id'], False),
+    ('products', 'ix_products_category_id', ['category_id'], False),
+    ('products', 'ix_products_seller_id', ['seller_id'], False),
+    ('orders', 'ix_orders_buyer_id', ['buyer_id'], False),
+    ('orders', 'ix_orders_shipping_address_id', ['shipping_address_id'], False),
+    ('payment_details', 'ix_payment_details_order_id', ['order_id'], False),
+    ('user_payments', 'ix_user_payments_user_id', ['user_id'], False),
+    ('order_items', 'ix_order_items_order_id', ['order_id'], False),
+    ('order_items', 'ix_order_items_product_id', ['product_id'], False),
+    ('user_addresses', 'ix_user_addresses_user_id', ['user_id'], False),
+    ('carts', 'ix_carts_user_id', ['user_id'], False),
+    ('cart_items', 'ix_cart_items_cart_id_product_id', ['cart_id', 'product_id'], True),
+    ('cart_items', 'ix_cart_items_product_id', ['product_id'], False),
+    ('reviews', 'ix_reviews_product_id', ['product_id'], False),
+    ('reviews', 'ix_reviews_user_id', ['user_id'], False),
+    ('wishlists', 'ix_wishlists_user_id_product_id', ['user_id', 'product_id'], True),
+    ('wishlists', 'ix_wishlists_product_id', ['product_id'], False),
+    ('checkouts', 'ix_checkouts_user_id', ['user_id'], False),
+    ('checkouts', 'ix_checkouts_cart_id', ['cart_id'], False),
+]
+
+
+def upgrade():
+    # The unique indexes will fail to build if duplicate (cart_id, product_id) or
+    # (user_id, product_id) rows already exist; merge those before upgrading.
+    for table, name, columns, unique in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=unique)
+
+
+def downgrade():
+    for table, name, columns, unique in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
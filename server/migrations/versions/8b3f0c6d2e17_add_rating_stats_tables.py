@@ -0,0 +1,72 @@
+"""Add product and seller rating stats tables
+
+Revision ID: 8b3f0c6d2e17
+Revises: 5e1d7a9c3b42
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f0c6d2e17'
+down_revision = '5e1d7a9c3b42'
+branch_labels = None
+depends_on = None
+
+
+def stat_columns():
+    return [
+        sa.Column('review_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('stars_1', sa.Integer(), nullable=False),
+        sa.Column('stars_2', sa.Integer(), nullable=False),
+        sa.Column('stars_3', sa.Integer(), nullable=False),
+        sa.Column('stars_4', sa.Integer(), nullable=False),
+        sa.Column('stars_5', sa.Integer(), nullable=False),
+    ]
+
+
+STAT_SELECT = """
+    COUNT(reviews.id), SUM(reviews.rating),
+    SUM(CASE WHEN reviews.rating = 1 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN reviews.rating = 2 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN reviews.rating = 3 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN reviews.rating = 4 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN reviews.rating = 5 THEN 1 ELSE 0 END)
+"""
+STAT_NAMES = "review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5"
+
+
+def upgrade():
+    op.create_table('product_rating_stats',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    *stat_columns(),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table('seller_rating_stats',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    *stat_columns(),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('seller_id')
+    )
+
+    # Backfill from existing reviews
+    op.execute(f"""
+        INSERT INTO product_rating_stats (product_id, {STAT_NAMES})
+        SELECT reviews.product_id, {STAT_SELECT}
+        FROM reviews GROUP BY reviews.product_id
+    """)
+    op.execute(f"""
+        INSERT INTO seller_rating_stats (seller_id, {STAT_NAMES})
+        SELECT products.seller_id, {STAT_SELECT}
+        FROM products JOIN reviews ON reviews.product_id = products.id
+        GROUP BY products.seller_id
+    """)
+
+
+def downgrade():
+    op.drop_table('seller_rating_stats')
+    op.drop_table('product_rating_stats')
@@ -0,0 +1,61 @@
+"""Add daily sales rollup tables
+
+Revision ID: c41e9a7f5d08
+Revises: 8b3f0c6d2e17
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e9a7f5d08'
+down_revision = '8b3f0c6d2e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('seller_daily_sales',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('seller_id', 'day')
+    )
+    op.create_table('product_daily_sales',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'day')
+    )
+
+    # Backfill from existing orders, as `flask backfill-sales-rollups` does
+    if op.get_bind().dialect.name == 'sqlite':
+        day = "date(orders.created_at)"
+    else:
+        day = "CAST(orders.created_at AS DATE)"
+    op.execute(f"""
+        INSERT INTO product_daily_sales (product_id, day, revenue, quantity)
+        SELECT order_items.product_id, {day}, SUM(order_items.price * order_items.quantity), SUM(order_items.quantity)
+        FROM order_items JOIN orders ON orders.id = order_items.order_id
+        GROUP BY order_items.product_id, {day}
+    """)
+    op.execute(f"""
+        INSERT INTO seller_daily_sales (seller_id, day, revenue, quantity, order_count)
+        SELECT products.seller_id, {day}, SUM(order_items.price * order_items.quantity), SUM(order_items.quantity),
+               COUNT(DISTINCT orders.id)
+        FROM order_items JOIN orders ON orders.id = order_items.order_id
+        JOIN products ON products.id = order_items.product_id
+        GROUP BY products.seller_id, {day}
+    """)
+
+
+def downgrade():
+    op.drop_table('product_daily_sales')
+    op.drop_table('seller_daily_sales')
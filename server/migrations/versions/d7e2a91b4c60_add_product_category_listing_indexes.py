@@ -0,0 +1,31 @@
+"""Add product category listing indexes
+
+Revision ID: d7e2a91b4c60
+Revises: c41e9a7f5d08
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2a91b4c60'
+down_revision = 'c41e9a7f5d08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Both composites lead with category_id, so the single-column index is redundant
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_category_id_price', ['category_id', 'price'], unique=False)
+        batch_op.create_index('ix_products_category_id_created_at', ['category_id', 'created_at'], unique=False)
+        batch_op.drop_index('ix_products_category_id')
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_category_id', ['category_id'], unique=False)
+        batch_op.drop_index('ix_products_category_id_created_at')
+        batch_op.drop_index('ix_products_category_id_price')
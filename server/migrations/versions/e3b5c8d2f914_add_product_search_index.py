@@ -0,0 +1,39 @@
+"""Add product search index
+
+Revision ID: e3b5c8d2f914
+Revises: d7e2a91b4c60
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b5c8d2f914'
+down_revision = 'd7e2a91b4c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE products_fts USING fts5("
+            "title, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute("INSERT INTO products_fts (rowid, title, description) SELECT id, title, description FROM products")
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_products_search ON products "
+            "USING GIN (to_tsvector('english', products.title || ' ' || products.description))"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE products_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX ix_products_search")
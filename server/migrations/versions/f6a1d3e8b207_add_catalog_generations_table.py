@@ -0,0 +1,35 @@
+"""Add catalog generations table
+
+Revision ID: f6a1d3e8b207
+Revises: e3b5c8d2f914
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a1d3e8b207'
+down_revision = 'e3b5c8d2f914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_generations = op.create_table('catalog_generations',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.now()
+    op.bulk_insert(catalog_generations, [
+        {'name': 'products', 'value': 0, 'updated_at': now},
+        {'name': 'categories', 'value': 0, 'updated_at': now},
+    ])
+
+
+def downgrade():
+    op.drop_table('catalog_generations')
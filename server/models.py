@@ -1,24 +1,115 @@
 #models.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import selectinload
 from datetime import datetime
+from serializers import compile_serializer
 
 db = SQLAlchemy()
 
+def _path_tree(paths):
+    """Turn dotted paths like ['order_items.product'] into {'order_items': {'product': {}}}."""
+    tree = {}
+    for path in paths or []:
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+def _tree_paths(tree):
+    """Inverse of _path_tree: {'a': {'b': {}}} -> ['a.b']."""
+    paths = []
+    for key, sub_tree in (tree or {}).items():
+        sub_paths = _tree_paths(sub_tree)
+        if sub_paths:
+            paths.extend(f"{key}.{sub}" for sub in sub_paths)
+        else:
+            paths.append(key)
+    return paths
+
+_column_serializers = {}
+
+def _column_serializer(model):
+    """The compiled every-column serializer for `model`, looked up without rebuilding its field tuple."""
+    serializer = _column_serializers.get(model)
+    if serializer is None:
+        columns = tuple(c.name for c in model.__table__.columns)
+        serializer = _column_serializers[model] = compile_serializer(model, columns, iso_dates=False)
+    return serializer
+
 class SerializerMixin:
-    def to_dict(self, include_relationships=False):
-        """Serialize model to dictionary, including optional relationships."""
-        data = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        
+    def to_dict(self, include_relationships=False, fields=None, include=None, max_depth=3, _seen=None):
+        """Serialize model to dictionary, including optional relationships.
+
+        fields: column names to keep; dotted names ('order_items.quantity')
+            restrict the columns of included relationships.
+        include: dotted relationship paths to embed, e.g. ['order_items.product'].
+            Load them up front with eager_load_options(include).
+        include_relationships: embed every relationship, up to max_depth levels.
+        An object already being serialized further up the tree is never
+        embedded again, so cyclic relationships terminate.
+        """
+        if fields is None and not include and not include_relationships:
+            return _column_serializer(type(self))(self)
+
+        seen = (_seen or frozenset()) | {(type(self), id(self))}
+        field_tree = _path_tree(fields) if fields is not None else None
+        if field_tree is None:
+            data = _column_serializer(type(self))(self)
+        else:
+            columns = tuple(c.name for c in self.__table__.columns if c.name in field_tree)
+            data = compile_serializer(type(self), columns, iso_dates=False)(self)
+
         if include_relationships:
-            for rel in self.__mapper__.relationships.keys():
-                rel_obj = getattr(self, rel)
-                if rel_obj is not None:
-                    if isinstance(rel_obj, list):
-                        data[rel] = [item.to_dict(include_relationships=True) for item in rel_obj]
-                    else:
-                        data[rel] = rel_obj.to_dict(include_relationships=True)
+            if max_depth <= 0:
+                return data
+            include_tree = {rel: None for rel in self.__mapper__.relationships.keys()}
+        else:
+            include_tree = _path_tree(include)
+
+        for rel, sub_include in include_tree.items():
+            if rel not in self.__mapper__.relationships:
+                raise ValueError(f"{type(self).__name__} has no relationship '{rel}'")
+            rel_obj = getattr(self, rel)
+            if rel_obj is None:
+                continue
+
+            sub_fields = None
+            if field_tree is not None and field_tree.get(rel):
+                sub_fields = _tree_paths(field_tree[rel])
+            options = dict(
+                include_relationships=include_relationships,
+                fields=sub_fields,
+                include=_tree_paths(sub_include),
+                max_depth=max_depth - 1,
+                _seen=seen
+            )
+
+            if isinstance(rel_obj, list):
+                data[rel] = [item.to_dict(**options) for item in rel_obj if (type(item), id(item)) not in seen]
+            elif (type(rel_obj), id(rel_obj)) not in seen:
+                data[rel] = rel_obj.to_dict(**options)
         return data
 
+    @classmethod
+    def eager_load_options(cls, include):
+        """Loader options that fetch the dotted `include` paths with one query per level."""
+        options = []
+
+        def walk(model, tree, parent):
+            for rel, sub_tree in tree.items():
+                if rel not in model.__mapper__.relationships:
+                    raise ValueError(f"{model.__name__} has no relationship '{rel}'")
+                attribute = getattr(model, rel)
+                loader = parent.selectinload(attribute) if parent is not None else selectinload(attribute)
+                target = model.__mapper__.relationships[rel].mapper.class_
+                if sub_tree:
+                    walk(target, sub_tree, loader)
+                else:
+                    options.append(loader)
+
+        walk(cls, _path_tree(include), None)
+        return options
+
 class Role(db.Model, SerializerMixin):
     __tablename__ = 'roles'
     id = db.Column(db.Integer, primary_key=True)
@@ -34,7 +125,7 @@ class User(db.Model, SerializerMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -58,6 +149,10 @@ class Category(db.Model, SerializerMixin):
 
 class Product(db.Model, SerializerMixin):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_category_id_price', 'category_id', 'price'),
+        db.Index('ix_products_category_id_created_at', 'category_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -65,7 +160,7 @@ class Product(db.Model, SerializerMixin):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     stock = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(200))
-    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -75,16 +170,18 @@ class Product(db.Model, SerializerMixin):
     cart_items = db.relationship('CartItem', order_by='CartItem.id', back_populates='product', cascade='all, delete-orphan')
     reviews = db.relationship('Review', order_by='Review.id', back_populates='product', cascade='all, delete-orphan')
     wishlists = db.relationship('Wishlist', order_by='Wishlist.id', back_populates='product', cascade='all, delete-orphan')
+    rating_stats = db.relationship('ProductRatingStats', uselist=False, back_populates='product', cascade='all, delete-orphan')
+    daily_sales = db.relationship('ProductDailySales', back_populates='product', cascade='all, delete-orphan')
 
 class Order(db.Model, SerializerMixin):
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True)
-    buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
-    shipping_address_id = db.Column(db.Integer, db.ForeignKey('user_addresses.id'), nullable=True)  # New field
+    shipping_address_id = db.Column(db.Integer, db.ForeignKey('user_addresses.id'), nullable=True, index=True)  # New field
 
     buyer = db.relationship('User', back_populates='orders')
     order_items = db.relationship('OrderItem', order_by='OrderItem.id', back_populates='order')
@@ -94,7 +191,7 @@ class Order(db.Model, SerializerMixin):
 class PaymentDetail(db.Model, SerializerMixin):
     __tablename__ = 'payment_details'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
     payment_method = db.Column(db.String, nullable=False)
     payment_status = db.Column(db.String, nullable=False)
     payment_date = db.Column(db.DateTime, default=datetime.now)
@@ -105,7 +202,7 @@ class PaymentDetail(db.Model, SerializerMixin):
 class UserPayment(db.Model, SerializerMixin):
     __tablename__ = 'user_payments'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     payment_method = db.Column(db.String, nullable=False)
     account_no = db.Column(db.String, nullable=False)
     payment_date = db.Column(db.DateTime, default=datetime.now)
@@ -121,8 +218,8 @@ class UserPayment(db.Model, SerializerMixin):
 class OrderItem(db.Model, SerializerMixin):
     __tablename__ = 'order_items'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -134,7 +231,7 @@ class OrderItem(db.Model, SerializerMixin):
 class UserAddress(db.Model, SerializerMixin):
     __tablename__ = 'user_addresses'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     address = db.Column(db.Text, nullable=False)
     telephone = db.Column(db.String(20))
     postal_code = db.Column(db.String(20))
@@ -150,7 +247,7 @@ class UserAddress(db.Model, SerializerMixin):
 class Cart(db.Model, SerializerMixin):
     __tablename__ = 'carts'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     total_price = db.Column(db.Float, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
@@ -162,9 +259,12 @@ class Cart(db.Model, SerializerMixin):
 
 class CartItem(db.Model, SerializerMixin):
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        db.Index('ix_cart_items_cart_id_product_id', 'cart_id', 'product_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('carts.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -176,8 +276,8 @@ class CartItem(db.Model, SerializerMixin):
 class Review(db.Model, SerializerMixin):
     __tablename__ = 'reviews'
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     rating = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -186,11 +286,77 @@ class Review(db.Model, SerializerMixin):
     product = db.relationship('Product', back_populates='reviews')
     user = db.relationship('User', back_populates='reviews')
 
+class RatingStatsMixin:
+    """Running review totals, kept in step with the reviews table by aggregates.py."""
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.review_count, 2) if self.review_count else None
+
+    def summary(self, histogram=False):
+        data = {"average": self.average_rating, "count": self.review_count}
+        if histogram:
+            data["histogram"] = {str(star): getattr(self, f'stars_{star}') for star in range(1, 6)}
+        return data
+
+class ProductRatingStats(db.Model, RatingStatsMixin, SerializerMixin):
+    __tablename__ = 'product_rating_stats'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+
+    product = db.relationship('Product', back_populates='rating_stats')
+
+class SellerRatingStats(db.Model, RatingStatsMixin, SerializerMixin):
+    __tablename__ = 'seller_rating_stats'
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+class SellerDailySales(db.Model, SerializerMixin):
+    """Per-seller sales totals for one day, maintained at checkout by aggregates.py."""
+    __tablename__ = 'seller_daily_sales'
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductDailySales(db.Model, SerializerMixin):
+    """Per-product sales totals for one day, maintained at checkout by aggregates.py."""
+    __tablename__ = 'product_daily_sales'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+    product = db.relationship('Product', back_populates='daily_sales')
+
+class RevokedToken(db.Model, SerializerMixin):
+    """A logged-out JWT, kept until the token would have expired anyway."""
+    __tablename__ = 'revoked_tokens'
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # NULL for tokens without exp
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+class CatalogGeneration(db.Model, SerializerMixin):
+    """A counter bumped by every write to one part of the catalog ('products' or 'categories')."""
+    __tablename__ = 'catalog_generations'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
 class Wishlist(db.Model, SerializerMixin):
     __tablename__ = 'wishlists'
+    __table_args__ = (
+        db.Index('ix_wishlists_user_id_product_id', 'user_id', 'product_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -207,15 +373,15 @@ class Admin(db.Model, SerializerMixin):
     password = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), index=True)
 
     role = db.relationship('Role')
 
 class Checkout(db.Model, SerializerMixin):
     __tablename__ = 'checkouts'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    cart_id = db.Column(db.Integer, db.ForeignKey('carts.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    cart_id = db.Column(db.Integer, db.ForeignKey('carts.id'), nullable=False, index=True)
     total_price = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)
     payment_status = db.Column(db.String(20), default='pending')
@@ -226,3 +392,36 @@ class Checkout(db.Model, SerializerMixin):
     cart = db.relationship('Cart', back_populates='checkout')
 
 
+class IdempotencyKey(db.Model, SerializerMixin):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_user_id_endpoint_key', 'user_id', 'endpoint', 'key', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the first request is in flight
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+def unindexed_foreign_keys(metadata=None):
+    """List foreign keys whose columns are not the leading columns of any index.
+
+    Primary keys and unique constraints count as indexes, since every supported
+    backend builds one for them.
+    """
+    metadata = metadata if metadata is not None else db.metadata
+    missing = []
+    for table in metadata.sorted_tables:
+        covering = [[c.name for c in index.columns] for index in table.indexes]
+        covering += [[c.name for c in constraint.columns] for constraint in table.constraints
+                     if isinstance(constraint, (db.PrimaryKeyConstraint, db.UniqueConstraint))]
+        for fk in table.foreign_key_constraints:
+            fk_columns = [c.name for c in fk.columns]
+            if not any(columns[:len(fk_columns)] == fk_columns for columns in covering):
+                missing.append(f"{table.name}({', '.join(fk_columns)})")
+    return missing
@@ -0,0 +1,128 @@
+#pagination.py
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+
+
+MAX_PER_PAGE = 100
+
+PageArgs = namedtuple('PageArgs', ['page', 'per_page', 'sort'])
+
+
+def page_args(args, default_per_page=20, sorts=None, default_sort=None):
+    """Read page, per_page and (when `sorts` is given) sort from request args.
+
+    per_page is capped at MAX_PER_PAGE and page is at least 1. Raises
+    ValueError for a non-positive per_page or a sort not in `sorts`.
+    """
+    per_page = min(args.get('per_page', default_per_page, type=int), MAX_PER_PAGE)
+    if per_page < 1:
+        raise ValueError("per_page must be positive")
+    page = max(args.get('page', 1, type=int), 1)
+
+    sort = None
+    if sorts is not None:
+        sort = args.get('sort', default_sort)
+        if sort not in sorts:
+            raise ValueError(f"Unsupported sort '{sort}'")
+    return PageArgs(page, per_page, sort)
+
+
+def cursor_meta(next_cursor, **extra):
+    """The meta block for a cursor page: `extra` fields, then next_cursor and has_more."""
+    return {**extra, 'next_cursor': next_cursor, 'has_more': next_cursor is not None}
+
+
+def encode_cursor(values):
+    """Pack the sort key values of the last row on a page into an opaque token."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, keys):
+    """Unpack a token made by encode_cursor, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Invalid cursor")
+
+    return [_decode_value(value, column) for value, (_, column, _) in zip(values, keys)]
+
+
+# Python types a decoded JSON value may have for a column of each type
+CURSOR_VALUE_TYPES = {
+    int: (int,),
+    float: (int, float),
+    str: (str,),
+}
+
+
+def _decode_value(value, column):
+    """Check one cursor value against its sort column, converting ISO strings for date columns."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError("Invalid cursor")
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        python_type = None
+
+    if python_type in (datetime, date):
+        if not isinstance(value, str):
+            raise ValueError("Invalid cursor")
+        try:
+            return python_type.fromisoformat(value)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    # Untyped sort expressions (e.g. computed averages) still only take scalars
+    allowed = CURSOR_VALUE_TYPES.get(python_type, (int, float, str))
+    if not isinstance(value, allowed):
+        raise ValueError("Invalid cursor")
+    return value
+
+
+def keyset_filter(keys, values):
+    """Build the WHERE clause selecting rows that sort strictly after `values`.
+
+    `keys` is a list of (name, column, descending) tuples; the last key must be
+    unique (normally the primary key) so the ordering is total.
+    """
+    clauses = []
+    for i, (_, column, descending) in enumerate(keys):
+        equal = [keys[j][1] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def keyset_order_by(keys):
+    return [column.desc() if descending else column.asc() for _, column, descending in keys]
+
+
+def keyset_page(query, keys, after=None, limit=10):
+    """Return (items, next_cursor) for one page of `query` ordered by `keys`.
+
+    Fetches one extra row to learn whether another page exists, so no COUNT
+    query is needed. `next_cursor` is None on the last page.
+    """
+    if after:
+        query = query.filter(keyset_filter(keys, decode_cursor(after, keys)))
+
+    rows = query.order_by(*keyset_order_by(keys)).limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, name) for name, _, _ in keys])
+    return items, next_cursor
@@ -0,0 +1,118 @@
+#payments.py
+import random
+import threading
+import time
+import uuid
+from flask import current_app
+import requests
+from requests.adapters import HTTPAdapter
+import stripe
+
+stripe.api_key = 'sk_test_51Pj5cTAEksgxXJsgAlOZSZzkkgwxFX2YJ1vju3R9F2FYKey9Unhj6r7egYdWEDWGSm94oQ9bt3Ko1a0pqKucqQLu00w9li6Psn'
+
+
+class PaymentError(Exception):
+    """The gateway declined or failed to process a charge or refund."""
+
+
+class ChargeResult:
+    def __init__(self, id, amount, currency, status, description, receipt_url, payment_method, payment_method_type):
+        self.id = id
+        self.amount = amount
+        self.currency = currency
+        self.status = status
+        self.description = description
+        self.receipt_url = receipt_url
+        self.payment_method = payment_method
+        self.payment_method_type = payment_method_type
+
+
+class StripeGateway:
+    """Stripe charges over a pooled, keep-alive HTTP session."""
+
+    def __init__(self, pool_size=10, timeout=30):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        stripe.default_http_client = stripe.RequestsClient(session=session, timeout=timeout)
+
+    def charge(self, amount, currency, description, source, idempotency_key=None):
+        params = dict(amount=amount, currency=currency, description=description, source=source)
+        if idempotency_key:
+            params['idempotency_key'] = f'charge-{idempotency_key}'
+        try:
+            charge = stripe.Charge.create(**params)
+        except stripe.error.StripeError as e:
+            raise PaymentError(str(e))
+
+        return ChargeResult(
+            id=charge.id,
+            amount=charge.amount,
+            currency=charge.currency,
+            status=charge.status,
+            description=charge.description,
+            receipt_url=charge.receipt_url,
+            payment_method=charge.payment_method,
+            payment_method_type=charge.payment_method_details['type']
+        )
+
+    def refund(self, charge_id):
+        try:
+            stripe.Refund.create(charge=charge_id)
+        except stripe.error.StripeError as e:
+            raise PaymentError(str(e))
+
+
+class FakeGateway:
+    """In-process gateway for offline load tests; never touches the network."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _fails(self):
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def charge(self, amount, currency, description, source, idempotency_key=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fails():
+            raise PaymentError("Your card was declined.")
+
+        charge_id = f'ch_fake_{uuid.uuid4().hex[:24]}'
+        return ChargeResult(
+            id=charge_id,
+            amount=amount,
+            currency=currency,
+            status='succeeded',
+            description=description,
+            receipt_url=f'https://payments.invalid/receipts/{charge_id}',
+            payment_method=f'pm_fake_{source}',
+            payment_method_type='card'
+        )
+
+    def refund(self, charge_id):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def get_gateway():
+    """Return the app's gateway, chosen by the PAYMENT_GATEWAY config value.
+
+    Calls are synchronous: the request thread waits out the gateway round trip.
+    """
+    gateway = current_app.extensions.get('payment_gateway')
+    if gateway is None:
+        config = current_app.config
+        if config.get('PAYMENT_GATEWAY', 'stripe') == 'fake':
+            gateway = FakeGateway(
+                latency=config.get('PAYMENT_FAKE_LATENCY', 0.0),
+                failure_rate=config.get('PAYMENT_FAKE_FAILURE_RATE', 0.0)
+            )
+        else:
+            gateway = StripeGateway(pool_size=config.get('PAYMENT_POOL_SIZE', 10))
+        current_app.extensions['payment_gateway'] = gateway
+    return gateway
@@ -0,0 +1,104 @@
+#projection.py
+from sqlalchemy import func
+from models import db, Product, Category, ProductRatingStats
+from serializers import compile_serializer
+
+# Product fields a list endpoint can select; "rating" comes from product_rating_stats
+PRODUCT_COLUMNS = {
+    "id": Product.id,
+    "title": Product.title,
+    "description": Product.description,
+    "price": Product.price,
+    "category_id": Product.category_id,
+    "category": Category.name,
+    "image_url": Product.image_url,
+    "seller_id": Product.seller_id,
+    "stock": Product.stock,
+    "in_stock": (Product.stock > 0),
+    "created_at": Product.created_at,
+}
+PRODUCT_FIELD_NAMES = list(PRODUCT_COLUMNS) + ["rating"]
+
+# Public listings are validated by the catalog generation, which cart writes only
+# bump when a product goes in or out of stock, so they offer in_stock but not the count
+LISTING_FIELD_NAMES = [name for name in PRODUCT_FIELD_NAMES if name != "stock"]
+
+# Average star rating, 0 for unrated products so it can be a cursor sort key
+RATING_AVERAGE = func.coalesce(
+    ProductRatingStats.rating_sum * 1.0 / func.nullif(ProductRatingStats.review_count, 0), 0
+)
+SORT_COLUMNS = {"rating_average": RATING_AVERAGE}
+
+
+def parse_fields(args, allowed, default):
+    """Read a comma separated `fields` argument, raising ValueError on unknown names."""
+    if not args.get('fields'):
+        return list(default)
+    fields = [name.strip() for name in args['fields'].split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def price_filters(args):
+    """Translate min_price and max_price arguments into WHERE clauses."""
+    filters = []
+    try:
+        if args.get('min_price'):
+            filters.append(Product.price >= float(args['min_price']))
+        if args.get('max_price'):
+            filters.append(Product.price <= float(args['max_price']))
+    except ValueError:
+        raise ValueError("min_price and max_price must be numbers")
+    return filters
+
+
+def stock_filters(args):
+    if args.get('in_stock', 'false').lower() in ('1', 'true', 'yes'):
+        return [Product.stock > 0]
+    return []
+
+
+def product_filters(args):
+    """Translate min_price, max_price and in_stock arguments into WHERE clauses."""
+    return price_filters(args) + stock_filters(args)
+
+
+def product_rows_query(fields, extra=()):
+    """Query selecting only the columns behind `fields` as plain rows, not Product entities.
+
+    `extra` names columns the caller needs on each row without returning them,
+    such as the sort keys of a cursor page. The id is always selected.
+    """
+    names = ["id"] + [name for name in list(fields) + list(extra) if name not in ("id", "rating")]
+    columns = [
+        (PRODUCT_COLUMNS[name] if name in PRODUCT_COLUMNS else SORT_COLUMNS[name]).label(name)
+        for name in dict.fromkeys(names)
+    ]
+    if "rating" in fields:
+        columns += [ProductRatingStats.review_count.label("review_count"), ProductRatingStats.rating_sum.label("rating_sum")]
+
+    query = db.session.query(*columns).select_from(Product)
+    if "category" in fields:
+        query = query.outerjoin(Category, Category.id == Product.category_id)
+    if "rating" in fields or "rating_average" in extra:
+        query = query.outerjoin(ProductRatingStats, ProductRatingStats.product_id == Product.id)
+    return query
+
+
+def serialize_product_rows(rows, fields):
+    serialize = compile_serializer(Product, tuple(name for name in fields if name != "rating"))
+    products = []
+    for row in rows:
+        product = serialize(row)
+        if "category" in product and product["category"] is None:
+            product["category"] = "Unknown"
+        if "rating" in fields:
+            count = row.review_count or 0
+            product["rating"] = {
+                "average": round(row.rating_sum / count, 2) if count else None,
+                "count": count
+            }
+        products.append(product)
+    return products
@@ -0,0 +1,90 @@
+#revocation.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models import db, RevokedToken
+
+FRONT_CACHE_SIZE = 10000
+CHECK_INTERVAL = 5  # seconds a "not revoked" answer is trusted before asking the DB again
+PURGE_INTERVAL = 300  # seconds between purges of expired rows
+
+
+class RevocationStore:
+    """Revoked JTIs in the revoked_tokens table, behind a bounded per-process LRU.
+
+    Revocations are cached until the token's own expiry, since a revoked
+    token never comes back. "Not revoked" answers are cached for
+    check_interval seconds, which bounds how long a logout in one worker
+    takes to reach the others; a logout in this worker applies at once.
+    """
+
+    def __init__(self, max_entries=FRONT_CACHE_SIZE, check_interval=CHECK_INTERVAL):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._entries = OrderedDict()  # jti -> (revoked, trust until, monotonic seconds)
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def _remember(self, jti, revoked, trust_for):
+        with self._lock:
+            self._entries[jti] = (revoked, time.monotonic() + trust_for)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, jti, exp=None):
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(jti)
+                return entry[0]
+
+        revoked = db.session.query(RevokedToken.query.filter_by(jti=jti).exists()).scalar()
+        if revoked:
+            self._remember(jti, True, _seconds_left(exp, default=self.check_interval))
+        else:
+            self._remember(jti, False, self.check_interval)
+        return revoked
+
+    def revoke(self, jti, exp=None):
+        """Revoke a token. `exp` is its expiry as a Unix timestamp, or None if it has none."""
+        expires_at = datetime.fromtimestamp(exp) if exp is not None else None
+        try:
+            db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # already revoked
+        self._remember(jti, True, _seconds_left(exp, default=self.check_interval))
+        self.purge_if_due()
+
+    def purge(self):
+        """Delete rows for tokens that have expired; returns how many went."""
+        deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.now()).delete(synchronize_session=False)
+        db.session.commit()
+        self._purged_at = time.monotonic()
+        return deleted
+
+    def purge_if_due(self):
+        if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+            self.purge()
+
+
+def _seconds_left(exp, default):
+    if exp is None:
+        return default
+    return max(exp - time.time(), 0)
+
+
+def get_revocation_store():
+    store = current_app.extensions.get('revocation_store')
+    if store is None:
+        config = current_app.config
+        store = RevocationStore(
+            max_entries=config.get('REVOCATION_CACHE_SIZE', FRONT_CACHE_SIZE),
+            check_interval=config.get('REVOCATION_CHECK_INTERVAL', CHECK_INTERVAL)
+        )
+        current_app.extensions['revocation_store'] = store
+    return store
@@ -0,0 +1,106 @@
+#search.py
+import re
+from sqlalchemy import DDL, column, event, func, literal_column, table, text
+from models import db, Product
+
+FTS_TABLE = 'products_fts'
+POSTGRES_INDEX = 'ix_products_search'
+MAX_TERMS = 8
+
+# Title hits rank above description hits
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Must match the expression index built by the migration, character for character
+POSTGRES_DOCUMENT = "to_tsvector('english', products.title || ' ' || products.description)"
+
+SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+# Databases built with db.create_all() get the search table or index alongside
+# products; migrated databases get them from migration e3b5c8d2f914
+event.listen(Product.__table__, 'after_create', DDL(SQLITE_CREATE).execute_if(dialect='sqlite'))
+event.listen(Product.__table__, 'after_create', DDL(
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON products USING GIN ({POSTGRES_DOCUMENT})"
+).execute_if(dialect='postgresql'))
+event.listen(Product.__table__, 'before_drop', DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect='sqlite'))
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def search_terms(query_text):
+    """Split user input into at most MAX_TERMS lowercase word tokens."""
+    return re.findall(r'\w+', query_text.lower())[:MAX_TERMS]
+
+
+def _postgres_query(terms):
+    return func.to_tsquery(literal_column("'english'"), ' & '.join(f'{term}:*' for term in terms))
+
+
+def search_filter(query, terms):
+    """Restrict a product query to rows matching every term as a prefix.
+
+    Terms must come from search_terms(), which strips any query syntax.
+    """
+    if _dialect() == 'postgresql':
+        return query.filter(literal_column(POSTGRES_DOCUMENT).op('@@')(_postgres_query(terms)))
+
+    fts = table(FTS_TABLE, column('rowid'))
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return query.join(fts, fts.c.rowid == Product.id).filter(literal_column(FTS_TABLE).op('MATCH')(match))
+
+
+def apply_search(query, terms):
+    """search_filter(), ordered best match first."""
+    query = search_filter(query, terms)
+    if _dialect() == 'postgresql':
+        rank = func.ts_rank(literal_column(POSTGRES_DOCUMENT), _postgres_query(terms)).desc()
+    else:
+        rank = func.bm25(literal_column(FTS_TABLE), TITLE_WEIGHT, DESCRIPTION_WEIGHT)
+    return query.order_by(rank, Product.id)
+
+
+def index_product(product):
+    """Add or refresh a product's search entry. Runs in the caller's transaction.
+
+    Postgres searches an expression index it maintains itself, so only SQLite
+    needs this.
+    """
+    if _dialect() != 'sqlite':
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': product.id})
+    db.session.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)"),
+        {'id': product.id, 'title': product.title, 'description': product.description}
+    )
+
+
+def unindex_product(product_id):
+    if _dialect() != 'sqlite':
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': product_id})
+
+
+def rebuild_search_index():
+    """Recreate the SQLite search table from the products table."""
+    if _dialect() != 'sqlite':
+        return
+    db.session.execute(text(SQLITE_CREATE))
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, description) SELECT id, title, description FROM products"
+    ))
+    db.session.commit()
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from dropping the search table and index, which have no model."""
+    if type_ == 'table' and name.startswith(FTS_TABLE):
+        return False
+    if type_ == 'index' and name == POSTGRES_INDEX:
+        return False
+    return True
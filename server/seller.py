@@ -1,65 +1,90 @@
 #seller.py
-from flask import Blueprint, request, jsonify, make_response
-from datetime import datetime
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Product, Category, Order,OrderItem, Review, UserPayment
+import csv
+import io
+import json
+from flask import Blueprint, request, jsonify, make_response, Response, stream_with_context
+from werkzeug.datastructures import MultiDict
+from datetime import datetime, timedelta
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
+from models import db, User, Product, Order,OrderItem, Review, UserPayment, ProductRatingStats, SellerDailySales, ProductDailySales
 from flask_restful import Api, Resource
 from config import cloudinary
+from pagination import cursor_meta, keyset_page, page_args
+from sqlalchemy.orm import contains_eager, joinedload
+from aggregates import remove_product_ratings
+from search import index_product, unindex_product
+from cache import invalidate, product_tags
+from generations import PRODUCTS, bump_generation
+from categories import find_category
+from serializers import compile_serializer
+from projection import PRODUCT_FIELD_NAMES, parse_fields, product_rows_query, serialize_product_rows
 
 seller_bp = Blueprint('seller_bp', __name__, url_prefix='/shopit/seller')
 seller_api = Api(seller_bp)
 
 
+PROFILE_RECENT_COUNT = 5
+
+SELLER_PRODUCT_FIELDS = ["id", "title", "description", "price", "category", "image_url", "seller_id", "stock"]
+PROFILE_PRODUCT_FIELDS = ["id", "title", "description", "price", "category", "image_url", "stock"]
+
+ORDER_FIELDS = ["order_id", "buyer_id", "total_price", "status", "created_at", "updated_at", "order_items"]
+
+
+def seller_products_page(seller_id, fields, after=None, per_page=PROFILE_RECENT_COUNT, newest_first=False):
+    """One cursor page of a seller's products, selecting only the requested columns."""
+    query = product_rows_query(fields).filter(Product.seller_id == seller_id)
+    keys = [('id', Product.id, newest_first)]
+    rows, next_cursor = keyset_page(query, keys, after, per_page)
+    return serialize_product_rows(rows, fields), next_cursor
+
+
+SELLER_ORDER_LIST_FIELDS = (
+    ("order_id", "id"), ("buyer_name", "buyer.username"), "total_price", "status", "created_at", "updated_at"
+)
+
+ORDER_ITEM_FIELDS = ("product_id", ("product_title", "product.title"), "quantity", "price")
+
+
+def serialize_seller_orders(orders, items_by_order, fields=ORDER_FIELDS):
+    order_fields = tuple(("order_id", "id") if name == "order_id" else name for name in fields if name != "order_items")
+    serialize_order = compile_serializer(Order, order_fields)
+    serialize_item = compile_serializer(OrderItem, ORDER_ITEM_FIELDS)
+    orders_list = []
+    for order in orders:
+        order_data = serialize_order(order)
+        if "order_items" in fields:
+            order_data["order_items"] = [serialize_item(item) for item in items_by_order.get(order.id, [])]
+        orders_list.append(order_data)
+    return orders_list
+
+
 class SellerProfile(Resource):
     @jwt_required()
     def get(self):
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
+        user = current_user.user
+        if user is None:
+            return {"error": "User not found"}, 404
 
-        # Get products for the seller
-        products = Product.query.filter_by(seller_id=user_id).all()
-        products_list = [
-            {
-                "id": product.id,
-                "title": product.title,
-                "description": product.description,
-                "price": product.price,
-                "category": product.category.name if product.category else "Unknown",
-                "image_url": product.image_url,
-                "stock": product.stock
-            }
-            for product in products
-        ]
+        # Constant-size summary; the full lists live at /profile/products and /profile/orders
+        product_count = db.session.query(db.func.count(Product.id)).filter(Product.seller_id == user_id).scalar()
+        total_sales, order_count = db.session.query(
+            db.func.coalesce(db.func.sum(SellerDailySales.revenue), 0.0),
+            db.func.coalesce(db.func.sum(SellerDailySales.order_count), 0)
+        ).filter(SellerDailySales.seller_id == user_id).one()
 
-        # Get orders for the seller
-        orders = db.session.query(Order).join(OrderItem).join(Product).filter(Product.seller_id == user_id).all()
-        orders_list = []
-        for order in orders:
-            order_items = [
-                {
-                    "product_id": item.product_id,
-                    "product_title": item.product.title,
-                    "quantity": item.quantity,
-                    "price": item.price
-                } for item in order.order_items if item.product.seller_id == user_id
-            ]
-
-            if order_items:
-                orders_list.append({
-                    "order_id": order.id,
-                    "buyer_id": order.buyer_id,
-                    "total_price": order.total_price,
-                    "status": order.status,
-                    "created_at": order.created_at.isoformat(), 
-                    "updated_at": order.updated_at.isoformat(),  
-                    "order_items": order_items
-                })
+        recent_products, _ = seller_products_page(user_id, PROFILE_PRODUCT_FIELDS, newest_first=True)
+        orders, items_by_order, _ = seller_orders_page(user_id, MultiDict({'per_page': PROFILE_RECENT_COUNT}))
 
         profile = {
             "username": user.username,
             "email": user.email,
-            "products": products_list,
-            "orders": orders_list
+            "product_count": product_count,
+            "order_count": order_count,
+            "total_sales": total_sales,
+            "recent_products": recent_products,
+            "recent_orders": serialize_seller_orders(orders, items_by_order)
         }
 
         return jsonify(profile)
@@ -67,9 +92,9 @@ class SellerProfile(Resource):
     @jwt_required()
     def put(self):
         user_id = get_jwt_identity()
-        seller = User.query.get(user_id)
+        seller = current_user.user
 
-        if not seller or seller.role.id != 2:
+        if not seller or not current_user.has_role('Seller'):
             return {"error": "Unauthorized"}, 403
 
         data = request.json
@@ -99,17 +124,48 @@ class SellerProfile(Resource):
 
     #     return {"message": "Seller profile deleted"}, 200
 
+class SellerProfileProducts(Resource):
+    @jwt_required()
+    def get(self):
+        user_id = get_jwt_identity()
+
+        try:
+            _, per_page, _ = page_args(request.args)
+            fields = parse_fields(request.args, PRODUCT_FIELD_NAMES, PROFILE_PRODUCT_FIELDS)
+            products, next_cursor = seller_products_page(user_id, fields, request.args.get('after'), per_page)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return jsonify({
+            "products": products,
+            "meta": cursor_meta(next_cursor)
+        })
+
+class SellerProfileOrders(Resource):
+    @jwt_required()
+    def get(self):
+        user_id = get_jwt_identity()
+
+        try:
+            fields = parse_fields(request.args, ORDER_FIELDS, ORDER_FIELDS)
+            orders, items_by_order, next_cursor = seller_orders_page(user_id, request.args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return jsonify({
+            "orders": serialize_seller_orders(orders, items_by_order, fields),
+            "meta": cursor_meta(next_cursor)
+        })
+
 class CreateProduct(Resource):
     @jwt_required()
     def post(self):
         data = request.form
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user or user.role.id != 2:
+        if not current_user.has_role('Seller'):
             return {"error": "Only sellers can create products"}, 403
 
-        category = Category.query.filter_by(id=data['category_id']).first()
+        category = find_category(data['category_id'])
 
         if not category:
             return {"error": "Category not found"}, 404
@@ -126,14 +182,18 @@ class CreateProduct(Resource):
             title=data['title'],
             description=data['description'],
             price=float(data['price']),
-            category=category,
+            category_id=category.id,
             image_url=image_url,
             seller_id=user_id,
             stock=int(data.get('stock', 0))
         )
 
         db.session.add(product)
+        db.session.flush()
+        index_product(product)
+        bump_generation(PRODUCTS)
         db.session.commit()
+        invalidate(*product_tags(product.id, category.id))
 
         return {"message": "Product created", "product": product.id}, 201
 
@@ -145,44 +205,36 @@ class GetProductsBySeller(Resource):
 
         seller_id = user_id  
 
-        products = Product.query.filter_by(seller_id=seller_id).all()
+        try:
+            fields = parse_fields(request.args, PRODUCT_FIELD_NAMES, SELLER_PRODUCT_FIELDS)
+        except ValueError as e:
+            return {"error": str(e)}, 400
 
-        if not products:
+        rows = product_rows_query(fields).filter(Product.seller_id == seller_id).order_by(Product.id).all()
+
+        if not rows:
             return {"message": "No products found for this seller"}, 404
-        return [
-            {
-                "id": product.id,
-                "title": product.title,
-                "description": product.description,
-                "price": product.price,
-                "category": product.category.name if product.category else "Unknown",
-                "image_url": product.image_url,
-                "seller_id": product.seller_id,
-                "stock": product.stock
-            }
-            for product in products
-        ], 200
+        return serialize_product_rows(rows, fields), 200
 
 class UpdateProduct(Resource):
     @jwt_required()
     def put(self, product_id):
         data = request.form
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
         product = Product.query.get_or_404(product_id)
 
-        if not user or user.role.id != 2 or product.seller_id != user_id:
+        if not current_user.has_role('Seller') or product.seller_id != user_id:
             return {"error": "Only the seller who created the product can update it"}, 403
 
-        category = Category.query.filter_by(id=data['category_id']).first()
+        category = find_category(data['category_id'])
         if not category:
             return {"error": "Category not found"}, 404
 
+        old_category_id = product.category_id
         product.title = data['title']
         product.description = data['description']
         product.price = float(data['price'])
-        product.category = category
+        product.category_id = category.id
 
         if 'file' in request.files:
             file = request.files['file']
@@ -193,62 +245,108 @@ class UpdateProduct(Resource):
         product.stock = int(data.get('stock', product.stock))
         product.updated_at = datetime.now()
 
+        index_product(product)
+        bump_generation(PRODUCTS)
         db.session.commit()
+        invalidate(*product_tags(product_id, old_category_id, category.id))
         return {"message": "Product updated", "product": product.id}, 200
 
 class DeleteProduct(Resource):
     @jwt_required()
     def delete(self, product_id):
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
         product = Product.query.get_or_404(product_id)
 
-        if not user or user.role.id != 2 or product.seller_id != user_id:
+        if not current_user.has_role('Seller') or product.seller_id != user_id:
             return {"error": "Only the seller who created the product can delete it"}, 403
 
+        category_id = product.category_id
+        remove_product_ratings(product)
+        unindex_product(product.id)
         db.session.delete(product)
+        bump_generation(PRODUCTS)
         db.session.commit()
+        invalidate(*product_tags(product_id, category_id))
         return {"message": "Product deleted"}, 200
     
+def parse_date_range(args):
+    """Read optional `from`/`to` ISO dates; a bare `to` date includes that whole day."""
+    try:
+        start = datetime.fromisoformat(args['from']) if args.get('from') else None
+        end = datetime.fromisoformat(args['to']) if args.get('to') else None
+    except ValueError:
+        raise ValueError("from and to must be ISO dates, e.g. 2024-08-01")
+    if end is not None and len(args['to']) == 10:
+        end += timedelta(days=1)
+    return start, end
+
+
+ORDER_CURSOR_KEYS = [('created_at', Order.created_at, True), ('id', Order.id, True)]
+
+def seller_orders_page(seller_id, args):
+    """One cursor page of the orders containing this seller's products.
+
+    Returns (orders, items_by_order, next_cursor), where items_by_order only
+    holds the seller's own line items. Takes two queries however many orders
+    and items there are. Raises ValueError on bad filter or cursor arguments.
+    """
+    _, per_page, _ = page_args(args)
+    start, end = parse_date_range(args)
+
+    seller_order_ids = db.select(OrderItem.order_id).join(Product).where(Product.seller_id == seller_id)
+    query = Order.query.options(
+        joinedload(Order.buyer).load_only(User.username, User.first_name, User.last_name)
+    ).filter(Order.id.in_(seller_order_ids))
+    if start:
+        query = query.filter(Order.created_at >= start)
+    if end:
+        query = query.filter(Order.created_at < end)
+    if args.get('status'):
+        query = query.filter(Order.status == args['status'])
+
+    orders, next_cursor = keyset_page(query, ORDER_CURSOR_KEYS, args.get('after'), per_page)
+
+    items_by_order = {}
+    if orders:
+        items = OrderItem.query.join(OrderItem.product).options(
+            contains_eager(OrderItem.product).load_only(Product.title, Product.image_url)
+        ).filter(
+            OrderItem.order_id.in_([order.id for order in orders]),
+            Product.seller_id == seller_id
+        ).order_by(OrderItem.id)
+        for item in items:
+            items_by_order.setdefault(item.order_id, []).append(item)
+
+    return orders, items_by_order, next_cursor
+
+
 class SellerOrders(Resource):
     @jwt_required()
     def get(self):
         user_id = get_jwt_identity()
-        seller = User.query.get(user_id)
-
-        if not seller or seller.role.id != 2:
+        if not current_user.has_role('Seller'):
             return {"error": "Unauthorized"}, 403
-        
-        orders = db.session.query(Order).join(OrderItem).join(Product).filter(Product.seller_id == user_id).all()
 
+        try:
+            orders, items_by_order, next_cursor = seller_orders_page(user_id, request.args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        serialize_order = compile_serializer(Order, SELLER_ORDER_LIST_FIELDS)
+        serialize_item = compile_serializer(OrderItem, ORDER_ITEM_FIELDS + (("image_url", "product.image_url"),))
         orders_list = []
         for order in orders:
-            buyer = User.query.get(order.buyer_id) 
-
-            order_items = [
-                {
-                    "product_id": item.product_id,
-                    "product_title": item.product.title,
-                    "quantity": item.quantity,
-                    "price": item.price,
-                    "image_url":item.product.image_url
-                } for item in order.order_items if item.product.seller_id == user_id
-            ]
+            buyer = order.buyer
 
-            if order_items:  
-                orders_list.append({
-                    "order_id": order.id,
-                    "buyer_name": buyer.username, 
-                    "description": f"Order by {buyer.first_name} {buyer.last_name}", 
-                    "total_price": order.total_price,
-                    "status": order.status,
-                    "created_at": order.created_at,
-                    "updated_at": order.updated_at,
-                    "Order Items":order_items
-                })
+            order_data = serialize_order(order)
+            order_data["description"] = f"Order by {buyer.first_name} {buyer.last_name}"
+            order_data["Order Items"] = [serialize_item(item) for item in items_by_order.get(order.id, [])]
+            orders_list.append(order_data)
 
-        return jsonify({"orders": orders_list})
+        return jsonify({
+            "orders": orders_list,
+            "meta": cursor_meta(next_cursor)
+        })
 
 
 
@@ -257,9 +355,7 @@ class SellerOrderDetail(Resource):
     @jwt_required()
     def get(self, order_id):
         user_id = get_jwt_identity()
-        seller = User.query.get(user_id)
-
-        if not seller or seller.role.id != 2:
+        if not current_user.has_role('Seller'):
             return {"error": "Unauthorized"}, 403
 
         order = Order.query.get(order_id)
@@ -294,16 +390,15 @@ class TotalSales(Resource):
     @jwt_required()
     def get(self):
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
         
         # Ensure the user is a seller
-        if user.role.name != 'Seller':
+        if not current_user.has_role('Seller'):
             return {"error": "Unauthorized access"}, 403
         
-        # Query for total sales from all orders
+        # Sum the daily rollups rather than every order item
         total_sales = db.session.query(
-            db.func.sum(OrderItem.price * OrderItem.quantity)
-        ).join(Product).filter(Product.seller_id == user_id).scalar() or 0.0
+            db.func.sum(SellerDailySales.revenue)
+        ).filter(SellerDailySales.seller_id == user_id).scalar() or 0.0
         
         return {"total_sales": total_sales}, 200
 
@@ -312,10 +407,9 @@ class ProductSales(Resource):
     @jwt_required()
     def get(self, product_id):
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
         
         # Ensure the user is a seller
-        if user.role.name != 'Seller':
+        if not current_user.has_role('Seller'):
             return {"error": "Unauthorized access"}, 403
 
         # Check if the product belongs to the seller
@@ -323,12 +417,63 @@ class ProductSales(Resource):
         if not product:
             return {"error": "Product not found or does not belong to you"}, 404
 
-        # Query for total sales of the specific product
+        # Sum the daily rollups rather than every order item
         total_sales = db.session.query(
-            db.func.sum(OrderItem.price * OrderItem.quantity)
-        ).filter(OrderItem.product_id == product_id).scalar() or 0.0
+            db.func.sum(ProductDailySales.revenue)
+        ).filter(ProductDailySales.product_id == product_id).scalar() or 0.0
         
         return {"product_id": product_id, "total_sales": total_sales}, 200
+
+
+def sales_period(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+class SalesTimeSeries(Resource):
+    @jwt_required()
+    def get(self):
+        user_id = get_jwt_identity()
+        if not current_user.has_role('Seller'):
+            return {"error": "Unauthorized access"}, 403
+
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in ('day', 'week', 'month'):
+            return {"error": "granularity must be day, week or month"}, 400
+        try:
+            start, end = parse_date_range(request.args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        query = SellerDailySales.query.filter(SellerDailySales.seller_id == user_id)
+        if start:
+            query = query.filter(SellerDailySales.day >= start.date())
+        if end:
+            query = query.filter(SellerDailySales.day < end.date())
+
+        # Rows are one per day, so rolling them up into weeks or months is cheap
+        buckets = {}
+        for row in query.order_by(SellerDailySales.day):
+            period = sales_period(row.day, granularity)
+            bucket = buckets.setdefault(period, {"period": period.isoformat(), "revenue": 0.0, "quantity": 0, "order_count": 0})
+            bucket["revenue"] += row.revenue
+            bucket["quantity"] += row.quantity
+            bucket["order_count"] += row.order_count
+
+        series = list(buckets.values())
+        return {
+            "granularity": granularity,
+            "from": request.args.get('from'),
+            "to": request.args.get('to'),
+            "series": series,
+            "totals": {
+                "revenue": sum(bucket["revenue"] for bucket in series),
+                "quantity": sum(bucket["quantity"] for bucket in series),
+                "order_count": sum(bucket["order_count"] for bucket in series)
+            }
+        }, 200
     
 class SellerShopRating(Resource):
     @jwt_required()
@@ -338,29 +483,60 @@ class SellerShopRating(Resource):
         if user_id != seller_id:
             return {"error": "Unauthorized access to ratings for this seller"}, 403
 
-        products = Product.query.filter_by(seller_id=seller_id).all()
-
-        if not products:
+        days = request.args.get('days', type=int)
+        if days is not None and days <= 0:
+            return {"error": "days must be a positive number"}, 400
+
+        # One grouped query: every product of the seller with its review totals.
+        # Without a window the materialized per-product totals are enough;
+        # a window has to aggregate the raw reviews.
+        if days is None:
+            rows = db.session.query(
+                Product.id, Product.title,
+                db.func.coalesce(ProductRatingStats.review_count, 0),
+                db.func.coalesce(ProductRatingStats.rating_sum, 0)
+            ).outerjoin(ProductRatingStats).filter(Product.seller_id == seller_id).order_by(Product.id).all()
+        else:
+            since = datetime.now() - timedelta(days=days)
+            rows = db.session.query(
+                Product.id, Product.title,
+                db.func.count(Review.id),
+                db.func.coalesce(db.func.sum(Review.rating), 0)
+            ).outerjoin(Review, db.and_(Review.product_id == Product.id, Review.created_at >= since)).filter(
+                Product.seller_id == seller_id
+            ).group_by(Product.id, Product.title).order_by(Product.id).all()
+
+        if not rows:
             return {"message": "No products found for this seller"}, 404
 
-        total_rating = 0
-        count = 0
+        total_rating = sum(rating_sum for _, _, _, rating_sum in rows)
+        count = sum(review_count for _, _, review_count, _ in rows)
 
-        for product in products:
-            reviews = Review.query.filter_by(product_id=product.id).all()
-            for review in reviews:
-                total_rating += review.rating
-                count += 1
+        products = [
+            {
+                "product_id": product_id,
+                "title": title,
+                "review_count": review_count,
+                "average_rating": round(rating_sum / review_count, 2) if review_count else None
+            }
+            for product_id, title, review_count, rating_sum in rows
+        ]
 
         if count == 0:
-            return {"seller_id": seller_id, "average_rating": "N/A"}, 200
+            return {"seller_id": seller_id, "average_rating": "N/A", "review_count": 0, "days": days, "products": products}, 200
 
         average_rating = total_rating / count
         shop_rating_in_percentage = average_rating * 20
 
         formatted_rating = f"{shop_rating_in_percentage:.2f}%"
 
-        return {"seller_id": seller_id, "average_rating": formatted_rating}, 200
+        return {
+            "seller_id": seller_id,
+            "average_rating": formatted_rating,
+            "review_count": count,
+            "days": days,
+            "products": products
+        }, 200
     
 class SellerProductPayments(Resource):
     @jwt_required()
@@ -368,47 +544,96 @@ class SellerProductPayments(Resource):
         user_id = get_jwt_identity()
         
         # Ensure the user is a seller
-        user = User.query.get_or_404(user_id)
-        if user.role.name != 'Seller':
+        if not current_user.has_role('Seller'):
             return {"error": "Unauthorized access"}, 403
         
-        # Query for all orders containing products from this seller
-        orders = db.session.query(Order).join(OrderItem).join(Product).filter(Product.seller_id == user_id).all()
-        
-        # Collect payment information
-        payments_summary = {}
-        for order in orders:
-            buyer = User.query.get(order.buyer_id)
-            for item in order.order_items:
-                if item.product.seller_id == user_id:
-                    if item.product_id not in payments_summary:
-                        payments_summary[item.product_id] = {
-                            "product_title": item.product.title,
-                            "total_amount": 0.0,
-                            "total_quantity": 0,
-                            "buyers": set()
-                        }
-                    payments_summary[item.product_id]["total_amount"] += item.price * item.quantity
-                    payments_summary[item.product_id]["total_quantity"] += item.quantity
-                    payments_summary[item.product_id]["buyers"].add(buyer.username)
+        # Aggregate per product in the database
+        rows = db.session.query(
+            Product.id,
+            Product.title,
+            db.func.sum(OrderItem.price * OrderItem.quantity),
+            db.func.sum(OrderItem.quantity),
+            db.func.count(db.distinct(Order.buyer_id))
+        ).join(OrderItem, OrderItem.product_id == Product.id).join(Order).filter(
+            Product.seller_id == user_id
+        ).group_by(Product.id, Product.title).order_by(Product.id)
 
         # Format response
         payments_list = [
             {
                 "product_id": product_id,
-                "product_title": details["product_title"],
-                "total_amount": details["total_amount"],
-                "total_quantity": details["total_quantity"],
-                "buyers": list(details["buyers"])
+                "product_title": product_title,
+                "total_amount": total_amount,
+                "total_quantity": total_quantity,
+                "buyer_count": buyer_count
             }
-            for product_id, details in payments_summary.items()
+            for product_id, product_title, total_amount, total_quantity, buyer_count in rows
         ]
         
         return make_response(jsonify({"payments_summary": payments_list}), 200)
 
 
+class SellerProductBuyersExport(Resource):
+    EXPORT_COLUMNS = ["product_id", "product_title", "buyer_id", "buyer_username", "total_quantity", "total_amount"]
+
+    @jwt_required()
+    def get(self):
+        user_id = get_jwt_identity()
+
+        if not current_user.has_role('Seller'):
+            return {"error": "Unauthorized access"}, 403
+
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return {"error": "format must be ndjson or csv"}, 400
+
+        query = db.select(
+            Product.id,
+            Product.title,
+            User.id,
+            User.username,
+            db.func.sum(OrderItem.quantity),
+            db.func.sum(OrderItem.price * OrderItem.quantity)
+        ).join(OrderItem, OrderItem.product_id == Product.id).join(Order).join(User, User.id == Order.buyer_id).where(
+            Product.seller_id == user_id
+        ).group_by(Product.id, Product.title, User.id, User.username).order_by(Product.id, User.id)
+
+        product_id = request.args.get('product_id', type=int)
+        if product_id is not None:
+            query = query.where(Product.id == product_id)
+
+        # Rows are fetched from the cursor in batches and written out as they
+        # arrive, so memory stays flat however many buyers there are
+        rows = db.session.execute(query.execution_options(yield_per=1000))
+        columns = self.EXPORT_COLUMNS
+
+        if export_format == 'csv':
+            def generate():
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow(row)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+            mimetype = 'text/csv'
+        else:
+            def generate():
+                for row in rows:
+                    yield json.dumps(dict(zip(columns, row))) + "\n"
+            mimetype = 'application/x-ndjson'
+
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=product_buyers.{export_format}'
+        return response
+
+
     
 seller_api.add_resource(SellerProfile, '/profile')
+seller_api.add_resource(SellerProfileProducts, '/profile/products')
+seller_api.add_resource(SellerProfileOrders, '/profile/orders')
 seller_api.add_resource(CreateProduct, '/create_product')
 seller_api.add_resource(GetProductsBySeller, '/products_by_seller')
 seller_api.add_resource(UpdateProduct, '/product/<int:product_id>')
@@ -417,5 +642,7 @@ seller_api.add_resource(SellerOrders, '/orders')
 seller_api.add_resource(SellerOrderDetail, '/orders/<int:order_id>')
 seller_api.add_resource(TotalSales, '/total_sales')
 seller_api.add_resource(ProductSales, '/product_sales/<int:product_id>')
+seller_api.add_resource(SalesTimeSeries, '/sales')
 seller_api.add_resource(SellerShopRating, '/shop_rating/<int:seller_id>')
-seller_api.add_resource(SellerProductPayments, '/product_payments')
\ No newline at end of file
+seller_api.add_resource(SellerProductPayments, '/product_payments')
+seller_api.add_resource(SellerProductBuyersExport, '/product_payments/buyers')
\ No newline at end of file
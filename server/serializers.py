@@ -0,0 +1,77 @@
+#serializers.py
+import threading
+from datetime import date, datetime
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _is_temporal(model, path):
+    """True if the attribute at `path` (e.g. ['product', 'created_at']) is a date/datetime column."""
+    for name in path[:-1]:
+        relationship = model.__mapper__.relationships.get(name)
+        if relationship is None:
+            return False
+        model = relationship.mapper.class_
+    column = model.__table__.columns.get(path[-1])
+    if column is None:
+        return False
+    try:
+        return issubclass(column.type.python_type, (date, datetime))
+    except NotImplementedError:
+        return False
+
+
+def compile_serializer(model, fields, iso_dates=True):
+    """Return a cached function turning one `model` row into a dict.
+
+    `fields` is a tuple of attribute names, or (output key, dotted attribute
+    path) pairs such as ('product_title', 'product.title'). The function body
+    is generated once per (model, fields). When every plain column it needs is
+    already loaded on the instance it reads them straight from the instance
+    __dict__, skipping the ORM attribute machinery that dominates getattr;
+    otherwise (expired or deferred columns, projected rows) it falls back to
+    attribute access. Date and datetime columns are rendered with isoformat()
+    unless iso_dates is False.
+    """
+    cache_key = (model, fields, iso_dates)
+    serializer = _compiled.get(cache_key)
+    if serializer is not None:
+        return serializer
+
+    columns = model.__table__.columns
+    loaded_names = []
+    fast_entries = []
+    slow_entries = []
+    for field in fields:
+        key, attribute = (field, field) if isinstance(field, str) else field
+        path = attribute.split('.')
+        if not all(part.isidentifier() for part in path):
+            raise ValueError(f"Invalid attribute path '{attribute}'")
+        slow = 'obj.' + attribute
+        fast = slow
+        if len(path) == 1 and attribute in columns:
+            loaded_names.append(attribute)
+            fast = f'state[{attribute!r}]'
+        if iso_dates and _is_temporal(model, path):
+            slow, fast = f'iso({slow})', f'iso({fast})'
+        slow_entries.append(f'{key!r}: {slow}')
+        fast_entries.append(f'{key!r}: {fast}')
+
+    source = (
+        'def serialize(obj):\n'
+        '    state = getattr(obj, "__dict__", EMPTY)\n'
+        '    if LOADED <= state.keys():\n'
+        '        return {' + ', '.join(fast_entries) + '}\n'
+        '    return {' + ', '.join(slow_entries) + '}\n'
+    )
+    namespace = {'iso': iso, 'EMPTY': {}, 'LOADED': frozenset(loaded_names)}
+    exec(compile(source, f'<serializer {model.__name__}>', 'exec'), namespace)
+    serializer = namespace['serialize']
+
+    with _lock:
+        return _compiled.setdefault(cache_key, serializer)
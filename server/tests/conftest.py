@@ -0,0 +1,78 @@
+#conftest.py
+import os
+import sys
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Role, User
+from auth import auth_bp, jwt
+from buyer import buyer_bp
+from general import general_bp
+from seller import seller_bp
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SECRET_KEY'] = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['CACHE_BACKEND'] = 'none'
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(buyer_bp)
+    app.register_blueprint(general_bp)
+    app.register_blueprint(seller_bp)
+    db.init_app(app)
+    jwt.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """Return a function that calls `fn` and reports how many statements it ran."""
+    def count(fn):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            result = fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return result, statements
+    return count
+
+
+def make_user(role_name, username):
+    """Add a user with the named role, creating the role if needed."""
+    role = Role.query.filter_by(name=role_name).first()
+    if role is None:
+        role = Role(name=role_name)
+        db.session.add(role)
+        db.session.flush()
+    user = User(username=username, email=f'{username}@example.com', password='x', role_id=role.id)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth_header(user, role_name):
+    token = create_access_token(identity=user.id, additional_claims={'kind': 'user', 'role': role_name})
+    return {'Authorization': f'Bearer {token}'}
+
@@ -0,0 +1,37 @@
+#test_cart.py
+from conftest import auth_header, make_user
+from models import db, Category, Product, Cart, CartItem
+
+
+def make_cart(item_count):
+    buyer = make_user('Buyer', 'buyer')
+    seller = make_user('Seller', 'seller')
+    category = Category(name='Widgets')
+    db.session.add(category)
+    db.session.flush()
+
+    cart = Cart(user_id=buyer.id, total_price=0)
+    db.session.add(cart)
+    db.session.flush()
+    for i in range(item_count):
+        product = Product(title=f'Widget {i}', description='A widget', price=10 + i,
+                          category_id=category.id, seller_id=seller.id, stock=5)
+        db.session.add(product)
+        db.session.flush()
+        db.session.add(CartItem(cart_id=cart.id, product_id=product.id, quantity=1, price=product.price))
+        cart.total_price += product.price
+    db.session.commit()
+    return buyer
+
+
+def test_get_cart_query_count_does_not_grow_with_items(client, count_queries):
+    buyer = make_cart(item_count=10)
+    headers = auth_header(buyer, 'Buyer')
+    # Warm the revocation store so the count covers the cart read alone
+    client.get('/shopit/buyer/cart', headers=headers)
+
+    response, statements = count_queries(lambda: client.get('/shopit/buyer/cart', headers=headers))
+
+    assert response.status_code == 200
+    assert len(response.json['cart_items']) == 10
+    assert len(statements) == 1, statements
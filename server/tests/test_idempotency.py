@@ -0,0 +1,78 @@
+#test_idempotency.py
+import json
+
+import pytest
+from flask import jsonify, make_response, request
+from flask_jwt_extended import jwt_required
+
+from conftest import auth_header, make_user
+from idempotency import idempotent
+from models import db, IdempotencyKey
+
+
+@pytest.fixture
+def calls(app):
+    """Mount an idempotent endpoint answering with the status in its body; record each run."""
+    calls = []
+
+    @jwt_required()
+    @idempotent('echo')
+    def echo():
+        calls.append(1)
+        return make_response(jsonify({"run": len(calls)}), request.get_json()['status'])
+
+    app.add_url_rule('/echo', 'echo', echo, methods=['POST'])
+    return calls
+
+
+@pytest.fixture
+def post(client):
+    headers = auth_header(make_user('Buyer', 'buyer'), 'Buyer')
+
+    def post(key, status=201, body=None):
+        data = json.dumps(body or {'status': status})
+        return client.post('/echo', data=data, content_type='application/json',
+                           headers={**headers, 'Idempotency-Key': key})
+    return post
+
+
+def test_repeated_key_replays_the_stored_response(calls, post):
+    first = post('key-1')
+    second = post('key-1')
+
+    assert len(calls) == 1
+    assert second.status_code == first.status_code == 201
+    assert second.json == first.json
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert IdempotencyKey.query.filter_by(key='key-1').one().status_code == 201
+
+
+def test_key_in_flight_is_a_conflict(calls, post):
+    # Run the request once so the key row exists, then mark it unfinished again
+    post('key-1')
+    IdempotencyKey.query.filter_by(key='key-1').update({'status_code': None, 'response_body': None})
+    db.session.commit()
+
+    response = post('key-1')
+
+    assert response.status_code == 409
+    assert len(calls) == 1
+
+
+def test_key_reused_with_a_different_body_is_rejected(calls, post):
+    post('key-1')
+
+    response = post('key-1', body={'status': 201, 'other': True})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_server_errors_are_not_stored(calls, post):
+    assert post('key-1', status=500).status_code == 500
+    assert IdempotencyKey.query.filter_by(key='key-1').count() == 0
+
+    retry = post('key-1', status=500)
+
+    assert len(calls) == 2
+    assert 'Idempotent-Replayed' not in retry.headers
@@ -0,0 +1,47 @@
+#test_listing_etags.py
+from conftest import auth_header, make_user
+from models import db, Category, Product
+
+
+def make_product(stock):
+    seller = make_user('Seller', 'seller')
+    category = Category(name='Lamps')
+    db.session.add(category)
+    db.session.flush()
+    product = Product(title='Lamp', description='A lamp', price=20, category_id=category.id, seller_id=seller.id, stock=stock)
+    db.session.add(product)
+    db.session.commit()
+    return product.id
+
+
+def listing(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/shopit/products', query_string={'fields': 'id,in_stock'}, headers=headers)
+
+
+def test_cart_writes_only_change_listings_when_stock_runs_out(client):
+    product_id = make_product(stock=3)
+    headers = auth_header(make_user('Buyer', 'buyer'), 'Buyer')
+    first = listing(client)
+    assert first.json['products'] == [{'id': product_id, 'in_stock': True}]
+
+    client.post('/shopit/buyer/add_to_cart', headers=headers, json={'product_id': product_id, 'quantity': 1})
+    assert listing(client, first.headers['ETag']).status_code == 304
+
+    client.put('/shopit/buyer/cart/update', headers=headers, json={'items': [{'product_id': product_id, 'quantity': 3}]})
+    sold_out = listing(client, first.headers['ETag'])
+    assert sold_out.status_code == 200
+    assert sold_out.json['products'] == [{'id': product_id, 'in_stock': False}]
+
+    client.put('/shopit/buyer/cart/update', headers=headers, json={'items': [{'product_id': product_id, 'quantity': 2}]})
+    back = listing(client, sold_out.headers['ETag'])
+    assert back.status_code == 200
+    assert back.json['products'] == [{'id': product_id, 'in_stock': True}]
+
+
+def test_listings_do_not_offer_the_exact_stock_count(client):
+    make_product(stock=3)
+
+    response = client.get('/shopit/products', query_string={'fields': 'id,stock'})
+
+    assert response.status_code == 400
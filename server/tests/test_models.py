@@ -0,0 +1,6 @@
+#test_models.py
+from models import unindexed_foreign_keys
+
+
+def test_every_foreign_key_is_indexed():
+    assert unindexed_foreign_keys() == []
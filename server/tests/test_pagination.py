@@ -0,0 +1,42 @@
+#test_pagination.py
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from models import Product
+from pagination import decode_cursor, encode_cursor
+
+KEYS = [('created_at', Product.created_at, True), ('price', Product.price, False), ('id', Product.id, True)]
+
+
+def token(values):
+    raw = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 17, 12, 30)
+    assert decode_cursor(encode_cursor([created_at, 9.5, 3]), KEYS) == [created_at, 9.5, 3]
+
+
+@pytest.mark.parametrize('values', [
+    [{'a': 1}, 9.5, 3],
+    ['2026-10-17T12:30:00', 'cheap', 3],
+    ['2026-10-17T12:30:00', 9.5, 3.5],
+    ['2026-10-17T12:30:00', 9.5, True],
+    ['yesterday', 9.5, 3],
+    [1760700000, 9.5, 3],
+    ['2026-10-17T12:30:00', [9.5], 3],
+])
+def test_cursor_values_must_match_column_types(values):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(token(values), KEYS)
+
+
+def test_mistyped_cursor_is_a_bad_request(client):
+    response = client.get('/shopit/products', query_string={'pagination': 'cursor', 'after': token([{'a': 1}])})
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Invalid cursor"}
@@ -0,0 +1,75 @@
+#test_ratings.py
+import pytest
+from sqlalchemy import func
+
+from conftest import auth_header, make_user
+from models import db, Category, Order, OrderItem, Product, ProductRatingStats, Review, SellerRatingStats
+
+STAT_NAMES = ['review_count', 'rating_sum'] + [f'stars_{star}' for star in range(1, 6)]
+
+
+def expected_totals(*filters):
+    """Totals recomputed from scratch over the reviews matching `filters`."""
+    ratings = [rating for (rating,) in db.session.query(Review.rating).join(Product).filter(*filters)]
+    totals = {'review_count': len(ratings), 'rating_sum': sum(ratings)}
+    totals.update({f'stars_{star}': ratings.count(star) for star in range(1, 6)})
+    return totals
+
+
+def stored_totals(stats):
+    if stats is None:
+        return {name: 0 for name in STAT_NAMES}
+    return {name: getattr(stats, name) for name in STAT_NAMES}
+
+
+def assert_totals_match(seller):
+    db.session.expire_all()
+    for product in Product.query.all():
+        assert stored_totals(product.rating_stats) == expected_totals(Review.product_id == product.id)
+    seller_stats = db.session.get(SellerRatingStats, seller.id)
+    assert stored_totals(seller_stats) == expected_totals(Product.seller_id == seller.id)
+
+    average = db.session.query(func.avg(Review.rating)).join(Product).filter(Product.seller_id == seller.id).scalar()
+    if average is None:
+        assert seller_stats is None or seller_stats.review_count == 0
+    else:
+        assert seller_stats.rating_sum / seller_stats.review_count == pytest.approx(average)
+
+
+def test_rating_totals_follow_review_and_product_changes(client):
+    seller = make_user('Seller', 'seller')
+    buyers = [make_user('Buyer', f'buyer{i}') for i in range(2)]
+    category = Category(name='Lamps')
+    db.session.add(category)
+    db.session.flush()
+    products = [
+        Product(title=f'Lamp {i}', description='A lamp', price=20, category_id=category.id, seller_id=seller.id, stock=5)
+        for i in range(2)
+    ]
+    db.session.add_all(products)
+    db.session.flush()
+    for buyer in buyers:
+        order = Order(buyer_id=buyer.id, total_price=40, status='Successful')
+        db.session.add(order)
+        db.session.flush()
+        db.session.add_all([OrderItem(order_id=order.id, product_id=p.id, quantity=1, price=20) for p in products])
+    db.session.commit()
+    first, second = [p.id for p in products]
+    headers = [auth_header(buyer, 'Buyer') for buyer in buyers]
+
+    for buyer_headers, product_id, rating in [(headers[0], first, 4), (headers[1], first, 2), (headers[0], second, 5)]:
+        response = client.post('/shopit/buyer/reviews', headers=buyer_headers, json={'product_id': product_id, 'rating': rating})
+        assert response.status_code == 201
+    assert_totals_match(seller)
+
+    review_id = Review.query.filter_by(user_id=buyers[0].id, product_id=first).one().id
+    assert client.put(f'/shopit/buyer/reviews/{review_id}', headers=headers[0], json={'rating': 1}).status_code == 200
+    assert_totals_match(seller)
+
+    review_id = Review.query.filter_by(user_id=buyers[1].id, product_id=first).one().id
+    assert client.delete(f'/shopit/buyer/reviews/{review_id}', headers=headers[1]).status_code == 200
+    assert_totals_match(seller)
+
+    assert client.delete(f'/shopit/seller/product/{second}', headers=auth_header(seller, 'Seller')).status_code == 200
+    assert_totals_match(seller)
+    assert db.session.get(ProductRatingStats, second) is None
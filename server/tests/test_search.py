@@ -0,0 +1,31 @@
+#test_search.py
+from conftest import auth_header, make_user
+from models import db, Category
+
+
+def test_created_product_is_found_by_search(client):
+    seller = make_user('Seller', 'seller')
+    category = Category(name='Lamps')
+    db.session.add(category)
+    db.session.commit()
+    headers = auth_header(seller, 'Seller')
+
+    response = client.post('/shopit/seller/create_product', headers=headers, data={
+        'title': 'Brass desk lamp', 'description': 'Adjustable arm', 'price': '40', 'category_id': category.id
+    })
+    assert response.status_code == 201
+    product_id = response.json['product']
+
+    found = client.get('/shopit/products/search', query_string={'q': 'bras'})
+    assert found.status_code == 200
+    assert [product['id'] for product in found.json['products']] == [product_id]
+
+    response = client.put(f'/shopit/seller/product/{product_id}', headers=headers, data={
+        'title': 'Copper desk lamp', 'description': 'Adjustable arm', 'price': '40', 'category_id': category.id
+    })
+    assert response.status_code == 200
+    assert client.get('/shopit/products/search', query_string={'q': 'brass'}).json['products'] == []
+    assert len(client.get('/shopit/products/search', query_string={'q': 'copper'}).json['products']) == 1
+
+    assert client.delete(f'/shopit/seller/product/{product_id}', headers=headers).status_code == 200
+    assert client.get('/shopit/products/search', query_string={'q': 'copper'}).json['products'] == []